@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+class SocialMediaConfig(AppConfig):
+    """
+    Project-wide hooks that do not belong to a single app.
+    """
+    name = 'social_media'
+    verbose_name = 'Social media'
+
+    def ready(self):
+        from .db import configure_new_connection
+        connection_created.connect(configure_new_connection, dispatch_uid='social_media.db.configure_new_connection')
@@ -0,0 +1,113 @@
+"""
+Database routing, connection setup and row count estimates.
+
+ReplicaRouter sends reads to the 'replica' alias while read_from_replica()
+is active. ReplicaReadMixin activates it for the safe methods of a ViewSet.
+Everything else, including reads outside such a block, uses 'default'.
+Without a 'replica' database the router has no effect.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.permissions import SAFE_METHODS
+
+REPLICA_ALIAS = 'replica'
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+@contextmanager
+def read_from_replica():
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and REPLICA_ALIAS in settings.DATABASES:
+            return REPLICA_ALIAS
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS
+
+
+class ReplicaReadMixin:
+    """
+    Serve GET, HEAD and OPTIONS requests from the read replica. Reads may
+    lag slightly behind writes made on the primary.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return super().dispatch(request, *args, **kwargs)
+        with read_from_replica():
+            return super().dispatch(request, *args, **kwargs)
+
+
+def configure_sqlite(connection):
+    """
+    Apply SQLITE_PRAGMAS to a new SQLite connection.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_new_connection(sender, connection, **kwargs):
+    # connection_created receiver, connected in SocialMediaConfig.ready()
+    configure_sqlite(connection)
+
+
+def estimate_row_count(model, using='default'):
+    """
+    A cheap estimate of the number of rows in ``model``'s table, or None if
+    the backend has none.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Maintained by ANALYZE and autovacuum; -1 before the first one
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            row = cursor.fetchone()
+            return row[0] if row and row[0] >= 0 else None
+        if connection.vendor == 'sqlite' and model._meta.pk.get_internal_type() in ('AutoField', 'BigAutoField'):
+            # One b-tree seek; counts deleted rows too
+            cursor.execute(f'SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}')
+            return cursor.fetchone()[0] or 0
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for admin changelists over big tables. An unfiltered list
+    uses the table's estimated row count once that is above ``count_limit``;
+    a filtered list counts at most ``count_limit`` rows. Either way the
+    reported total, and so the last page number, can be approximate.
+    """
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.has_filters():
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > self.count_limit:
+                return estimate
+        return queryset[:self.count_limit].count()
@@ -0,0 +1,139 @@
+"""
+Background image pipeline for uploaded pictures.
+
+After an upload is committed, the original is re-encoded in a worker pool
+into resized variants (one per configured width and format) with EXIF data
+stripped. The variant storage names are saved on the model instance, e.g.
+``{'webp': {'320': 'variants/post_images/cat/320.webp'}, 'jpeg': {...}}``,
+and serializers expose them as URL maps. Until processing finishes the map
+is empty and clients fall back to the original file.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+PIL_FORMATS = {
+    'webp': 'WEBP',
+    'jpeg': 'JPEG',
+}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_PIPELINE_WORKERS', 2),
+            thread_name_prefix='image-pipeline',
+        )
+    return _executor
+
+
+def schedule_variants(instance, field_name, variants_field):
+    """
+    Queue variant generation for ``instance.<field_name>`` once the current
+    transaction commits. Clears the variants if the image was removed.
+    """
+    name = getattr(instance, field_name).name
+    if not name:
+        # Text-only posts were saved with no variants; nothing to clear
+        if getattr(instance, variants_field):
+            type(instance).objects.filter(pk=instance.pk).update(**{variants_field: {}})
+            setattr(instance, variants_field, {})
+        return
+
+    args = (instance._meta.label, instance.pk, field_name, variants_field, name)
+    if getattr(settings, 'IMAGE_PIPELINE_MODE', 'thread') == 'sync':
+        transaction.on_commit(lambda: process_image(*args))
+    else:
+        transaction.on_commit(lambda: get_executor().submit(process_image, *args))
+
+
+def process_image(model_label, pk, field_name, variants_field, name):
+    close_old_connections()
+    try:
+        variants = generate_variants(name)
+        model = apps.get_model(model_label)
+        instance = model.objects.filter(pk=pk).first()
+        # Skip if the object is gone or a newer image replaced this one
+        if instance is None or getattr(instance, field_name).name != name:
+            return
+        setattr(instance, variants_field, variants)
+        instance.save(update_fields=[variants_field])
+    except Exception:
+        logger.exception('Image processing failed for %s', name)
+    finally:
+        close_old_connections()
+
+
+def generate_variants(name):
+    """
+    Write resized, EXIF-free copies of the stored image ``name`` and return
+    their storage names keyed by format and width.
+    """
+    with default_storage.open(name, 'rb') as source:
+        image = Image.open(source)
+        # Apply the EXIF orientation before the metadata is dropped
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    for key in ('exif', 'xmp', 'icc_profile'):
+        image.info.pop(key, None)
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    stem = os.path.splitext(name)[0]
+    widths = sorted({min(width, image.width) for width in settings.IMAGE_VARIANT_WIDTHS})
+    variants = {}
+    for format_name in settings.IMAGE_VARIANT_FORMATS:
+        variants[format_name] = {}
+        for width in widths:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+            if format_name == 'jpeg' and resized.mode != 'RGB':
+                resized = resized.convert('RGB')
+
+            buffer = BytesIO()
+            resized.save(buffer, PIL_FORMATS[format_name], quality=settings.IMAGE_VARIANT_QUALITY)
+            variant_name = f'variants/{stem}/{width}.{format_name}'
+            if default_storage.exists(variant_name):
+                default_storage.delete(variant_name)
+            variants[format_name][str(width)] = default_storage.save(variant_name, ContentFile(buffer.getvalue()))
+    return variants
+
+
+def build_variant_urls(variants, request=None):
+    """
+    Turn stored variant names into ``{format: {width: url}}``.
+    """
+    urls = {}
+    for format_name, by_width in (variants or {}).items():
+        urls[format_name] = {}
+        for width, variant_name in by_width.items():
+            url = default_storage.url(variant_name)
+            urls[format_name][width] = request.build_absolute_uri(url) if request is not None else url
+    return urls
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    Read-only field exposing a variants JSON column as ``{format: {width: url}}``.
+    """
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return build_variant_urls(value, self.context.get('request'))
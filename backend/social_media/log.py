@@ -0,0 +1,118 @@
+"""
+Structured, non-blocking logging.
+
+QueuedHandler only puts records on an in-memory queue. A background
+listener thread formats them as one JSON object per line and writes them to
+stderr, so a slow log sink never blocks a request. RequestLogMiddleware gives
+each request an id, which every record logged while handling that request
+carries, and writes one access line with the request's timing.
+"""
+import atexit
+import copy
+import json
+import logging
+import queue
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+request_logger = logging.getLogger('social_media.requests')
+
+_request_id = ContextVar('request_id', default=None)
+
+# Attributes every LogRecord has; anything else was passed through extra=
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def get_request_id():
+    return _request_id.get()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(
+            (key, value) for key, value in vars(record).items()
+            if key not in RECORD_ATTRIBUTES and not key.startswith('_')
+        )
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class QueuedHandler(QueueHandler):
+    """
+    Hands records to a listener thread that writes them as JSON lines.
+    """
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        target = logging.StreamHandler(stream or sys.stderr)
+        target.setFormatter(JsonFormatter())
+        self.listener = QueueListener(self.queue, target, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def prepare(self, record):
+        # Resolve everything that depends on the caller's state; the JSON is
+        # built on the listener thread
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        record.request_id = _request_id.get()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class RequestLogMiddleware:
+    """
+    Tag the request with an id (the incoming X-Request-ID header or a new
+    one), return it in X-Request-ID and log the request with its timing.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = self.start(request)
+        return self.finish(request, self.get_response(request), started)
+
+    async def __acall__(self, request):
+        started = self.start(request)
+        return self.finish(request, await self.get_response(request), started)
+
+    def start(self, request):
+        request.request_id = request.headers.get('X-Request-ID', '')[:100] or uuid.uuid4().hex
+        # Left set after the response: Django logs 4xx/5xx responses
+        # (django.request) once all middleware has returned
+        _request_id.set(request.request_id)
+        return time.perf_counter()
+
+    def finish(self, request, response, started):
+        response['X-Request-ID'] = request.request_id
+        request_logger.info('%s %s %s', request.method, request.path, response.status_code, extra={
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+        })
+        return response
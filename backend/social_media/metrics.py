@@ -0,0 +1,239 @@
+"""
+Per-request query and latency metrics.
+
+RequestMetricsMiddleware times every query through an execute wrapper on
+each connection and times the top-level serializer ``.data`` call. Each request is
+tagged with its DRF view and action, e.g. ``PostViewSet.feed``. The results
+are:
+
+* sent back in a ``Server-Timing`` header (db, ser and total),
+* aggregated per view and exposed in Prometheus text format by metrics_view,
+* logged with the slowest SQL statements when a request goes over
+  REQUEST_METRICS_SLOW_MS or REQUEST_METRICS_MAX_QUERIES.
+
+DB time spent while serializing is counted in both db and ser.
+"""
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds of the request duration histogram
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestStats:
+    def __init__(self):
+        self.view = 'unknown'
+        self.query_count = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+        self.queries = []
+
+
+class MetricsRegistry:
+    """
+    Totals per view since the process started.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def record(self, stats, duration, status_code):
+        with self.lock:
+            view = self.views.setdefault(stats.view, {
+                'requests': 0, 'errors': 0, 'duration': 0.0, 'db_time': 0.0,
+                'serializer_time': 0.0, 'queries': 0, 'buckets': [0] * len(DURATION_BUCKETS),
+            })
+            view['requests'] += 1
+            view['errors'] += status_code >= 500
+            view['duration'] += duration
+            view['db_time'] += stats.db_time
+            view['serializer_time'] += stats.serializer_time
+            view['queries'] += stats.query_count
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    view['buckets'][index] += 1
+
+    def render(self):
+        with self.lock:
+            views = {name: {**totals, 'buckets': list(totals['buckets'])} for name, totals in self.views.items()}
+
+        lines = []
+        counters = [
+            ('http_requests_total', 'counter', 'Requests handled', 'requests'),
+            ('http_request_errors_total', 'counter', 'Requests answered with a 5xx status', 'errors'),
+            ('http_request_db_queries_total', 'counter', 'SQL queries issued', 'queries'),
+            ('http_request_db_seconds_total', 'counter', 'Time spent in SQL queries', 'db_time'),
+            ('http_request_serializer_seconds_total', 'counter', 'Time spent serializing', 'serializer_time'),
+        ]
+        for metric, metric_type, description, key in counters:
+            lines += [f'# HELP {metric} {description}', f'# TYPE {metric} {metric_type}']
+            lines += [f'{metric}{{view="{name}"}} {totals[key]}' for name, totals in sorted(views.items())]
+
+        metric = 'http_request_duration_seconds'
+        lines += [f'# HELP {metric} Wall time per request', f'# TYPE {metric} histogram']
+        for name, totals in sorted(views.items()):
+            for bound, count in zip(DURATION_BUCKETS, totals['buckets']):
+                lines.append(f'{metric}_bucket{{view="{name}",le="{bound}"}} {count}')
+            lines.append(f'{metric}_bucket{{view="{name}",le="+Inf"}} {totals["requests"]}')
+            lines.append(f'{metric}_sum{{view="{name}"}} {totals["duration"]}')
+            lines.append(f'{metric}_count{{view="{name}"}} {totals["requests"]}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def get_view_name(view_func, request):
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    # ViewSets map HTTP methods to actions; plain APIViews use the method name
+    actions = getattr(view_func, 'actions', None) or {}
+    method = request.method.lower()
+    return f'{view_class.__name__}.{actions.get(method, method)}'
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        stats.query_count += 1
+        stats.db_time += elapsed
+        stats.queries.append((elapsed, sql))
+
+
+def install_query_recorder(sender=None, connection=None, **kwargs):
+    """
+    Add record_query to a connection's execute wrappers. Connections are
+    per thread and async views query from sync_to_async threads, so the
+    wrapper stays installed and finds the request through a context variable.
+    """
+    if record_query not in connection.execute_wrappers:
+        # First, so execute_wrapper() blocks popping their own wrapper are unaffected
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def install_serializer_timing():
+    """
+    Time top-level ``serializer.data`` calls for the current request. Nested
+    serializers go through to_representation and are part of their parent.
+
+    This replaces BaseSerializer.data for the whole process, once, when the
+    middleware is first built. Outside a request the patched property only
+    adds a context variable lookup, and it is never removed, so subclasses
+    that override ``data`` are timed only if they call super().
+    """
+    if getattr(BaseSerializer, '_metrics_installed', False):
+        return
+    get_data = BaseSerializer.data.fget
+
+    def timed_data(self):
+        stats = _current.get()
+        if stats is None or stats.serializing:
+            return get_data(self)
+        stats.serializing = True
+        started = time.perf_counter()
+        try:
+            return get_data(self)
+        finally:
+            stats.serializer_time += time.perf_counter() - started
+            stats.serializing = False
+
+    BaseSerializer.data = property(timed_data)
+    BaseSerializer._metrics_installed = True
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_METRICS_ENABLED', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.slow_ms = getattr(settings, 'REQUEST_METRICS_SLOW_MS', 500)
+        self.max_queries = getattr(settings, 'REQUEST_METRICS_MAX_QUERIES', 50)
+        self.slow_sql_count = getattr(settings, 'REQUEST_METRICS_SLOW_SQL_COUNT', 3)
+        connection_created.connect(install_query_recorder)
+        for connection in connections.all():
+            install_query_recorder(connection=connection)
+        install_serializer_timing()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - started)
+
+    def finish(self, request, response, stats, duration):
+        registry.record(stats, duration, response.status_code)
+        response['Server-Timing'] = (
+            f'db;dur={stats.db_time * 1000:.1f};desc="{stats.query_count} queries", '
+            f'ser;dur={stats.serializer_time * 1000:.1f}, '
+            f'total;dur={duration * 1000:.1f}'
+        )
+        if duration * 1000 > self.slow_ms or stats.query_count > self.max_queries:
+            self.log_slow_request(request, stats, duration)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _current.get().view = get_view_name(view_func, request)
+
+    def log_slow_request(self, request, stats, duration):
+        slowest = sorted(stats.queries, key=lambda query: query[0], reverse=True)[:self.slow_sql_count]
+        logger.warning(
+            'Slow request %s %s (%s): %.1f ms, %d queries, %.1f ms in SQL. Slowest SQL:\n%s',
+            request.method, request.path, stats.view, duration * 1000, stats.query_count,
+            stats.db_time * 1000,
+            '\n'.join(f'  {elapsed * 1000:.1f} ms: {sql}' for elapsed, sql in slowest),
+        )
+
+
+def metrics_view(request):
+    """
+    Prometheus text exposition of the per-view totals.
+    """
+    if not getattr(settings, 'REQUEST_METRICS_ENABLED', False):
+        raise Http404()
+    if request.META.get('REMOTE_ADDR') not in getattr(settings, 'REQUEST_METRICS_ALLOWED_IPS', []):
+        raise Http404()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4')
@@ -1,37 +1,143 @@
 from django.contrib import admin
+from django.db.models import Q
+from django.forms.models import BaseInlineFormSet
+from django.urls import reverse
+from django.utils.html import format_html
+from social_media.db import EstimatedCountPaginator
 from .models import Post, Comment, Like
+from .search import get_backend, get_matching_post_ids
 
-class CommentInline(admin.TabularInline):
-    model = Comment
+# Rows shown in the read-only comment and like previews on a post's page
+INLINE_PREVIEW_SIZE = 20
+
+class PreviewInlineFormSet(BaseInlineFormSet):
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not queryset.query.is_sliced:
+            queryset = self._queryset = queryset[:INLINE_PREVIEW_SIZE]
+        return queryset
+
+class PreviewInline(admin.TabularInline):
+    """
+    Read-only preview of the newest related rows; the post page links to
+    the full, paginated changelist.
+    """
+    formset = PreviewInlineFormSet
     extra = 0
+    can_delete = False
+    show_change_link = True
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def get_readonly_fields(self, request, obj=None):
+        return self.fields
 
-class LikeInline(admin.TabularInline):
+class CommentInline(PreviewInline):
+    model = Comment
+    fields = ('author', 'content', 'created_at')
+    verbose_name_plural = f'latest {INLINE_PREVIEW_SIZE} comments'
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('post', 'author').order_by('-created_at', '-id')
+
+class LikeInline(PreviewInline):
     model = Like
-    extra = 0
+    fields = ('user', 'created_at')
+    verbose_name_plural = f'latest {INLINE_PREVIEW_SIZE} likes'
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('post', 'user').order_by('-id')
+
+class IndexedSearchMixin:
+    """
+    Admin search that only uses indexes: an exact username through the
+    unique username index, or words from a post through the full-text index
+    (see search.py). Substring matches would scan the whole table, so
+    search_fields is only used when there is no full-text index to search.
+    """
+    search_username_fields = ()
+    # Path from the admin's model to Post
+    search_post_field = None
+    search_help_text = 'Exact username, or words from the post title or content'
+    
+    def get_search_results(self, request, queryset, search_term):
+        if get_backend() == 'basic':
+            return super().get_search_results(request, queryset, search_term)
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        condition = Q()
+        for field in self.search_username_fields:
+            condition |= Q(**{field: term})
+        if self.search_post_field is not None:
+            condition |= Q(**{f'{self.search_post_field}__in': get_matching_post_ids(term)})
+        return queryset.filter(condition), False
+
+class LargeTableAdminMixin:
+    paginator = EstimatedCountPaginator
+    # Skips the extra unfiltered COUNT(*) shown next to filtered results
+    show_full_result_count = False
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
-    list_display = ('title', 'author', 'created_at', 'updated_at', 'get_likes_count')
+class PostAdmin(IndexedSearchMixin, LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('title', 'author', 'created_at', 'updated_at', 'get_likes_count', 'get_comments_count')
     list_filter = ('created_at', 'updated_at')
-    search_fields = ('title', 'content', 'author__username')
-    readonly_fields = ('created_at', 'updated_at')
+    list_select_related = ('author',)
+    search_fields = ('author__username', 'title', 'content')
+    search_username_fields = ('author__username',)
+    search_post_field = 'pk'
+    raw_id_fields = ('author',)
+    readonly_fields = ('created_at', 'updated_at', 'likes_count', 'comments_count', 'hot_score',
+                       'all_comments', 'all_likes')
     inlines = [CommentInline, LikeInline]
     
     def get_likes_count(self, obj):
-        return obj.likes.count()
+        return obj.likes_count
     
     get_likes_count.short_description = 'Likes'
+    get_likes_count.admin_order_field = 'likes_count'
+    
+    def get_comments_count(self, obj):
+        return obj.comments_count
+    
+    get_comments_count.short_description = 'Comments'
+    get_comments_count.admin_order_field = 'comments_count'
+    
+    @admin.display(description='All comments')
+    def all_comments(self, obj):
+        url = reverse('admin:posts_comment_changelist') + f'?post__id__exact={obj.pk}'
+        return format_html('<a href="{}">{} comments</a>', url, obj.comments_count)
+    
+    @admin.display(description='All likes')
+    def all_likes(self, obj):
+        url = reverse('admin:posts_like_changelist') + f'?post__id__exact={obj.pk}'
+        return format_html('<a href="{}">{} likes</a>', url, obj.likes_count)
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(IndexedSearchMixin, LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('post', 'author', 'content', 'created_at')
     list_filter = ('created_at',)
-    search_fields = ('content', 'author__username', 'post__title')
+    list_select_related = ('post', 'author')
+    search_fields = ('author__username', 'post__title')
+    search_username_fields = ('author__username',)
+    search_post_field = 'post'
+    raw_id_fields = ('post', 'author')
     readonly_fields = ('created_at',)
+    # Newest first along the primary key; created_at has no index of its own
+    ordering = ('-id',)
 
 @admin.register(Like)
-class LikeAdmin(admin.ModelAdmin):
+class LikeAdmin(IndexedSearchMixin, LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('post', 'user', 'created_at')
     list_filter = ('created_at',)
+    list_select_related = ('post', 'user')
     search_fields = ('user__username', 'post__title')
-    readonly_fields = ('created_at',) 
\ No newline at end of file
+    search_username_fields = ('user__username',)
+    search_post_field = 'post'
+    raw_id_fields = ('post', 'user')
+    readonly_fields = ('created_at',)
+    ordering = ('-id',)
@@ -0,0 +1,11 @@
+from django.urls import path
+from . import async_views
+
+# Async mirrors of the read-only post routes and the event stream; see async_views.py
+urlpatterns = [
+    path('', async_views.post_list, name='async-post-list'),
+    path('feed/', async_views.feed, name='async-post-feed'),
+    path('comments/', async_views.comment_list, name='async-comment-list'),
+    path('events/', async_views.events, name='async-post-events'),
+    path('<int:pk>/', async_views.post_detail, name='async-post-detail'),
+]
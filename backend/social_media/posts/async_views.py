@@ -0,0 +1,193 @@
+"""
+Async read paths for posts, mounted under /api/async/posts/.
+
+These mirror the GET responses of PostViewSet (list, retrieve, feed) and
+CommentViewSet (list) as plain Django async views, so under an ASGI server a
+request waiting on the database does not hold a worker thread. Queries go
+through the async ORM (aget, aiterator, ain_bulk). Serializers only run on
+preloaded data: likes are resolved up front and comments are prefetched
+before serializing.
+
+The sync ViewSets remain the API's default. The async paths do not support
+search, ordering or the shared response cache.
+
+``events`` streams the delta events from events.py as server-sent events.
+"""
+import asyncio
+import functools
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import prefetch_related_objects
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework import exceptions
+from rest_framework.request import Request
+
+from social_media.db import read_from_replica
+from social_media.users.authentication import aauthenticate_token
+from .events import get_broker
+from .models import Post, Comment, Like, get_comments_prefetch
+from .pagination import FeedPagination, HomeTimelinePagination, CommentPagination
+from .serializers import PostSerializer, CompactPostSerializer, CommentSerializer
+from .timelines import aget_feed_sources, aload_timeline_posts
+
+
+def async_api_view(require_authentication=False):
+    """
+    Token authentication, GET/HEAD only and DRF-style error bodies for an
+    async view, which receives a DRF Request.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                if request.method not in ('GET', 'HEAD'):
+                    raise exceptions.MethodNotAllowed(request.method)
+                credentials = await aauthenticate_token(request)
+                user = credentials[0] if credentials else AnonymousUser()
+                if require_authentication and not user.is_authenticated:
+                    raise exceptions.NotAuthenticated()
+
+                api_request = Request(request, authenticators=())
+                api_request.user = user
+                with read_from_replica():
+                    return await view(api_request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+                response = JsonResponse(data, status=exc.status_code, safe=False)
+                if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                    response['WWW-Authenticate'] = 'Token'
+                return response
+        return wrapper
+    return decorator
+
+
+async def aprefetch_related_objects(instances, *lookups):
+    # Django 5.0 ships this with the same implementation
+    await sync_to_async(prefetch_related_objects)(instances, *lookups)
+
+
+async def aget_liked_post_ids(user, posts):
+    if not user.is_authenticated:
+        return set()
+    likes = Like.objects.filter(user=user, post_id__in=[post.pk for post in posts])
+    return {post_id async for post_id in likes.values_list('post_id', flat=True).aiterator()}
+
+
+def get_post_shape(request, default):
+    shape = request.query_params.get('shape')
+    return shape if shape in ['full', 'compact'] else default
+
+
+async def serialize_posts(request, posts, shape, many=True):
+    """
+    Preload what PostSerializer reads for ``posts`` and serialize them.
+    """
+    if shape == 'compact':
+        serializer_class = CompactPostSerializer
+        prefetch = get_comments_prefetch(settings.POSTS_COMMENTS_PREVIEW_SIZE)
+    else:
+        serializer_class = PostSerializer
+        prefetch = get_comments_prefetch()
+    await aprefetch_related_objects(posts, prefetch)
+    context = {
+        'request': request,
+        'liked_post_ids': await aget_liked_post_ids(request.user, posts),
+    }
+    return serializer_class(posts if many else posts[0], many=many, context=context).data
+
+
+@async_api_view()
+async def post_list(request):
+    posts = [post async for post in Post.objects.select_related('author__profile').aiterator()]
+    data = await serialize_posts(request, posts, get_post_shape(request, 'compact'))
+    return JsonResponse(data, safe=False)
+
+
+@async_api_view()
+async def post_detail(request, pk):
+    try:
+        post = await Post.objects.select_related('author__profile').aget(pk=pk)
+    except Post.DoesNotExist:
+        raise exceptions.NotFound()
+    return JsonResponse(await serialize_posts(request, [post], get_post_shape(request, 'full'), many=False))
+
+
+@async_api_view(require_authentication=True)
+async def feed(request):
+    posts = Post.objects.select_related('author__profile')
+    sources = await aget_feed_sources(request.user)
+    if sources is None:
+        # Not following anyone yet: show all posts (except your own)
+        paginator = FeedPagination()
+        page = await paginator.apaginate_querysets([posts.exclude(author=request.user)], request)
+    else:
+        paginator = HomeTimelinePagination()
+        rows = await paginator.apaginate_querysets(sources, request)
+        page = await aload_timeline_posts(posts, rows)
+    data = await serialize_posts(request, page, get_post_shape(request, 'compact'))
+    return JsonResponse({'next': paginator.get_next_link(), 'results': data})
+
+
+@async_api_view(require_authentication=True)
+async def comment_list(request):
+    comments = Comment.objects.select_related('author__profile')
+    post_id = request.query_params.get('post_id')
+    if post_id:
+        if not post_id.isdigit():
+            raise exceptions.ValidationError({'post_id': ['A valid integer is required.']})
+        comments = comments.filter(post_id=post_id)
+    paginator = CommentPagination()
+    page = await paginator.apaginate_querysets([comments], request)
+    data = CommentSerializer(page, many=True, context={'request': request}).data
+    return JsonResponse({'next': paginator.get_next_link(), 'results': data})
+
+
+def parse_post_ids(value):
+    try:
+        return {int(post_id) for post_id in value.split(',') if post_id}
+    except ValueError:
+        raise exceptions.ValidationError({'post_ids': ['A comma-separated list of integers is required.']})
+
+
+async def stream_events(subscription, post_ids):
+    keepalive = getattr(settings, 'POSTS_EVENTS_KEEPALIVE', 15)
+    # Django 4.2 does not stop a stream when the client goes away, so streams
+    # end after a while and EventSource reconnects with Last-Event-ID
+    deadline = time.monotonic() + getattr(settings, 'POSTS_EVENTS_MAX_STREAM_SECONDS', 300)
+    try:
+        yield b'retry: 3000\n\n'
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                event = await asyncio.wait_for(subscription.__anext__(), min(keepalive, remaining))
+            except asyncio.TimeoutError:
+                yield b': keepalive\n\n'
+                continue
+            if post_ids and event.type != 'post_created' and event.data.get('post_id') not in post_ids:
+                continue
+            yield event.encode()
+    finally:
+        subscription.close()
+
+
+@async_api_view()
+async def events(request):
+    """
+    Server-sent events: post_created, post_likes and comment_created.
+    ``?post_ids=1,2`` limits likes and comments to those posts.
+    """
+    if not isinstance(request._request, ASGIRequest):
+        return JsonResponse({'detail': 'Server-sent events need an ASGI server.'}, status=501)
+    post_ids = parse_post_ids(request.query_params.get('post_ids', ''))
+    last_event_id = request.headers.get('Last-Event-ID') or request.query_params.get('last_event_id')
+    last_event_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+
+    subscription = get_broker().subscribe(last_event_id)
+    response = StreamingHttpResponse(stream_events(subscription, post_ids), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,141 @@
+"""
+Shared response cache for PostViewSet list and detail.
+
+Cached payloads never hold per-user data: is_liked is stripped before the
+payload is stored and resolved for the caller on every response. Cache keys
+embed version counters that the Post, Comment, Like and Profile signals bump,
+so a write makes stale entries unreachable instead of deleting them. The
+same versions feed the ETag, which lets If-None-Match be answered with 304
+before anything is serialized.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import Like
+
+LIST_VERSION_KEY = 'posts:version:list'
+AUTHORS_VERSION_KEY = 'posts:version:authors'
+USER_FIELDS = ('is_liked',)
+
+
+def get_cache():
+    return caches[getattr(settings, 'POSTS_CACHE_ALIAS', 'default')]
+
+
+def post_version_key(post_id):
+    return f'posts:version:post:{post_id}'
+
+
+def new_version():
+    # Seeded from the clock so an evicted counter never repeats old ETags
+    return int(time.time() * 1000)
+
+
+def get_versions(keys):
+    cache = get_cache()
+    versions = cache.get_many(keys)
+    missing = {key: new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(keys):
+    cache = get_cache()
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, new_version(), timeout=None)
+
+
+def invalidate_post(post_id):
+    bump_versions([LIST_VERSION_KEY, post_version_key(post_id)])
+
+
+def invalidate_posts(post_ids):
+    bump_versions([LIST_VERSION_KEY, *(post_version_key(post_id) for post_id in post_ids)])
+
+
+def invalidate_all():
+    bump_versions([LIST_VERSION_KEY, AUTHORS_VERSION_KEY])
+
+
+def digest(*parts):
+    return hashlib.sha1(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def get_post_items(data):
+    if isinstance(data, list):
+        return data
+    if 'results' in data:
+        return data['results']
+    return [data]
+
+
+def map_post_items(data, func):
+    if isinstance(data, list):
+        return [func(item) for item in data]
+    if 'results' in data:
+        return {**data, 'results': [func(item) for item in data['results']]}
+    return func(data)
+
+
+def strip_user_fields(data):
+    return map_post_items(
+        data, lambda item: {key: value for key, value in item.items() if key not in USER_FIELDS}
+    )
+
+
+def add_user_fields(data, user):
+    liked_post_ids = set()
+    if user.is_authenticated:
+        post_ids = [item['id'] for item in get_post_items(data)]
+        liked_post_ids = set(
+            Like.objects.filter(user=user, post_id__in=post_ids).values_list('post_id', flat=True)
+        )
+    return map_post_items(data, lambda item: {**item, 'is_liked': item['id'] in liked_post_ids})
+
+
+class CachedPostResponseMixin:
+    """
+    Serve list and retrieve from the shared response cache.
+    """
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            request, [LIST_VERSION_KEY], super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        post_id = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        return self.get_cached_response(
+            request, [AUTHORS_VERSION_KEY, post_version_key(post_id)], super().retrieve, *args, **kwargs
+        )
+
+    def get_cached_response(self, request, version_keys, build, *args, **kwargs):
+        versions = get_versions(version_keys)
+        # Image URLs are absolute, so the host is part of the payload
+        cache_key = 'posts:response:' + digest(request.get_host(), request.get_full_path(), *versions)
+        # JSON and MessagePack bodies of the same data need different validators
+        etag = '"%s"' % digest(cache_key, request.user.pk or 0, getattr(request, 'accepted_media_type', ''))
+
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        cache = get_cache()
+        data = cache.get(cache_key)
+        if data is not None:
+            return Response(add_user_fields(data, request.user), headers={'ETag': etag})
+
+        response = build(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(cache_key, strip_user_fields(response.data), getattr(settings, 'POSTS_CACHE_TIMEOUT', 300))
+            response['ETag'] = etag
+        return response
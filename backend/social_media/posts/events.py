@@ -0,0 +1,162 @@
+"""
+Server-sent delta events for posts.
+
+The write paths publish small JSON events once their transaction commits:
+
+* ``post_created``: ``{"post_id", "author_id", "created_at"}``
+* ``post_likes``: ``{"post_id", "likes_count"}``
+* ``comment_created``: ``{"post_id", "comment"}`` with the comment as the
+  API returns it
+
+Events go through the broker named by POSTS_EVENTS_BROKER. The default
+InProcessBroker only reaches subscribers in the same process; a broker backed
+by a shared pub/sub (e.g. Redis) implements the same methods. The SSE view
+in async_views.py streams a subscription to the client and needs an ASGI
+server, since every open stream is a pending request.
+"""
+import asyncio
+import itertools
+import json
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+# Sent instead of the missed events when a subscriber fell behind or resumed
+# from an event the backlog no longer holds; clients should refetch
+RESYNC = 'resync'
+
+
+class Event:
+    def __init__(self, event_id, event_type, data):
+        self.id = event_id
+        self.type = event_type
+        self.data = data
+
+    def encode(self):
+        data = json.dumps(self.data, separators=(',', ':'), default=str)
+        return f'id: {self.id}\nevent: {self.type}\ndata: {data}\n\n'.encode()
+
+
+class BaseBroker:
+    def publish(self, event_type, data):
+        """
+        Deliver an event to every subscriber. Called from request threads.
+        """
+        raise NotImplementedError
+
+    def subscribe(self, last_event_id=None):
+        """
+        Return a Subscription for the running event loop, starting after
+        ``last_event_id`` when given.
+        """
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+
+class Subscription:
+    """
+    Async iterator over the events a broker hands to ``put``. Holds at most
+    ``maxsize`` undelivered events; on overflow the queued and following
+    events are dropped until the subscriber has read a single resync event.
+    """
+    def __init__(self, broker, maxsize):
+        self.broker = broker
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.lagging = False
+
+    def put(self, event):
+        # From any thread
+        try:
+            self.loop.call_soon_threadsafe(self.deliver, event)
+        except RuntimeError:
+            # The loop closed without the subscription being closed
+            self.close()
+
+    def deliver(self, event):
+        if self.lagging:
+            return
+        if self.queue.full():
+            self.lagging = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event = Event(event.id, RESYNC, {})
+        self.queue.put_nowait(event)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        event = await self.queue.get()
+        if event.type == RESYNC:
+            self.lagging = False
+        return event
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker(BaseBroker):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.ids = itertools.count(1)
+        self.backlog = deque(maxlen=getattr(settings, 'POSTS_EVENTS_BACKLOG', 1000))
+
+    def publish(self, event_type, data):
+        with self.lock:
+            event = Event(next(self.ids), event_type, data)
+            self.backlog.append(event)
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def subscribe(self, last_event_id=None):
+        subscription = Subscription(self, getattr(settings, 'POSTS_EVENTS_QUEUE_SIZE', 100))
+        with self.lock:
+            self.subscribers.add(subscription)
+            if last_event_id is not None:
+                newest = self.backlog[-1].id if self.backlog else 0
+                oldest = self.backlog[0].id if self.backlog else 1
+                if last_event_id + 1 < oldest or last_event_id > newest:
+                    # Missed events left the backlog, or the id is from before a restart
+                    missed = [Event(newest, RESYNC, {})]
+                else:
+                    missed = [event for event in self.backlog if event.id > last_event_id]
+                for event in missed:
+                    subscription.deliver(event)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            path = getattr(settings, 'POSTS_EVENTS_BROKER', 'social_media.posts.events.InProcessBroker')
+            _broker = import_string(path)()
+        return _broker
+
+
+def publish(event_type, data):
+    """
+    Publish an event once the current transaction commits.
+    """
+    transaction.on_commit(lambda: get_broker().publish(event_type, data))
+
+
+def publish_like_counts(likes_counts):
+    for post_id, likes_count in likes_counts:
+        publish('post_likes', {'post_id': post_id, 'likes_count': likes_count})
@@ -0,0 +1,108 @@
+"""
+NDJSON export of posts, comments and likes for analytics.
+
+Each line is one flat JSON object tagged with its ``type``. Rows are read in
+primary key order, ``chunk_size`` at a time with keyset pagination, so
+memory use does not depend on table size and no cursor or transaction stays
+open between chunks (server-side cursors are off behind PgBouncer).
+``updated_since`` limits the export to posts updated and comments and likes
+created at or after that time; deletions are not exported. The tables are
+read one after another, not from one snapshot. Under ASGI the blocks are
+wrapped with aiter_blocks(), since Django reads a sync iterator to the end
+before an ASGI response sends anything.
+"""
+import zlib
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Post, Comment, Like
+
+EXPORT_TYPES = {
+    'posts': (Post, 'post', 'updated_at', (
+        'id', 'author_id', 'title', 'content', 'image', 'created_at', 'updated_at',
+        'likes_count', 'comments_count',
+    )),
+    'comments': (Comment, 'comment', 'created_at', ('id', 'post_id', 'author_id', 'content', 'created_at')),
+    'likes': (Like, 'like', 'created_at', ('id', 'post_id', 'user_id', 'created_at')),
+}
+
+# Lines are sent in blocks of about this many bytes
+BLOCK_SIZE = 64 * 1024
+
+
+def parse_updated_since(value):
+    """
+    An ISO 8601 date or datetime; naive values are in the current time zone.
+    """
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'"{value}" is not an ISO 8601 date or datetime')
+        moment = datetime(day.year, day.month, day.day)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def iter_rows(model, fields, since_field=None, updated_since=None, chunk_size=2000, using='default'):
+    rows = model._default_manager.using(using).order_by('pk').values(*fields)
+    if updated_since is not None:
+        rows = rows.filter(**{f'{since_field}__gte': updated_since})
+    last_pk = None
+    while True:
+        chunk = list((rows if last_pk is None else rows.filter(pk__gt=last_pk))[:chunk_size])
+        yield from chunk
+        if len(chunk) < chunk_size:
+            return
+        last_pk = chunk[-1]['id']
+
+
+def iter_ndjson(types=tuple(EXPORT_TYPES), updated_since=None, chunk_size=2000, using='default'):
+    """
+    Yield the export as blocks of NDJSON bytes.
+    """
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    block = []
+    size = 0
+    for name in types:
+        model, record_type, since_field, fields = EXPORT_TYPES[name]
+        for row in iter_rows(model, fields, since_field, updated_since, chunk_size, using):
+            line = encoder.encode({'type': record_type, **row}).encode() + b'\n'
+            block.append(line)
+            size += len(line)
+            if size >= BLOCK_SIZE:
+                yield b''.join(block)
+                block, size = [], 0
+    if block:
+        yield b''.join(block)
+
+
+def gzip_blocks(blocks):
+    """
+    Gzip a stream of byte blocks without holding it in memory.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for block in blocks:
+        compressed = compressor.compress(block)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+async def aiter_blocks(blocks):
+    """
+    Yield from a sync block iterator one block at a time, producing each in
+    Django's sync thread so queries use the same connection as the view.
+    """
+    blocks = iter(blocks)
+    next_block = sync_to_async(next, thread_sensitive=True)
+    while True:
+        block = await next_block(blocks, None)
+        if block is None:
+            return
+        yield block
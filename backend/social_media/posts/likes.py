@@ -0,0 +1,80 @@
+"""
+Idempotent like and unlike.
+
+Liking is one INSERT ... ON CONFLICT DO NOTHING that only selects posts that
+exist, and unliking is one conditional DELETE. Both return the ids of the
+posts whose state actually changed, so only those get their likes_count
+bumped. Repeated or concurrent requests cannot raise IntegrityError or push
+the counter out of step with the Like table.
+
+These are raw statements, so the Like save/delete signals do not fire and the
+cached post responses are invalidated here instead. The counter updates
+also move hot_score and return the new counts, which are published as
+post_likes events.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache import invalidate_posts
+from .events import publish_like_counts
+from .trending import get_likes_change_sql
+
+
+def update_likes_count(cursor, post_ids, change):
+    placeholders = ', '.join(['%s'] * len(post_ids))
+    hot_score_sql, hot_score_params = get_likes_change_sql(change)
+    cursor.execute(
+        f'UPDATE posts_post SET likes_count = likes_count + %s, hot_score = {hot_score_sql} '
+        f'WHERE id IN ({placeholders}) AND likes_count + %s >= 0 RETURNING id, likes_count',
+        [change, *hot_score_params, *post_ids, change],
+    )
+    publish_like_counts(cursor.fetchall())
+
+
+def like_posts(user, post_ids):
+    """
+    Like every existing post in ``post_ids`` and return the ids of the newly
+    liked ones.
+    """
+    post_ids = list(post_ids)
+    if not post_ids:
+        return []
+    placeholders = ', '.join(['%s'] * len(post_ids))
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO posts_like (post_id, user_id, created_at) '
+                f'SELECT id, %s, %s FROM posts_post WHERE id IN ({placeholders}) '
+                f'ON CONFLICT (post_id, user_id) DO NOTHING RETURNING post_id',
+                [user.pk, connection.ops.adapt_datetimefield_value(timezone.now()), *post_ids],
+            )
+            liked_ids = [row[0] for row in cursor.fetchall()]
+            if liked_ids:
+                update_likes_count(cursor, liked_ids, 1)
+    if liked_ids:
+        invalidate_posts(liked_ids)
+    return liked_ids
+
+
+def unlike_posts(user, post_ids):
+    """
+    Remove the user's likes on ``post_ids`` and return the ids of the posts
+    that were liked before.
+    """
+    post_ids = list(post_ids)
+    if not post_ids:
+        return []
+    placeholders = ', '.join(['%s'] * len(post_ids))
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM posts_like WHERE user_id = %s AND post_id IN ({placeholders}) '
+                f'RETURNING post_id',
+                [user.pk, *post_ids],
+            )
+            unliked_ids = [row[0] for row in cursor.fetchall()]
+            if unliked_ids:
+                update_likes_count(cursor, unliked_ids, -1)
+    if unliked_ids:
+        invalidate_posts(unliked_ids)
+    return unliked_ids
@@ -0,0 +1,274 @@
+import itertools
+import json
+import platform
+import random
+import statistics
+import time
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.settings import api_settings
+from rest_framework.test import APIClient
+
+from social_media.posts.cache import get_cache
+from social_media.posts.models import Post, Comment, Like, TimelineEntry
+from social_media.posts.search import rebuild_index
+from social_media.posts.timelines import get_fanout_limit
+from social_media.users.models import Profile, Follow
+
+BENCH_PASSWORD = 'bench-password'
+BENCH_THROTTLE_RATE = '1000000/min'
+ENDPOINTS = ['posts_list', 'post_detail', 'feed', 'like', 'comments', 'login']
+
+
+def zipf_weights(count, exponent=1.1):
+    # Cumulative weights: a few users and posts get most of the activity
+    return list(itertools.accumulate(1 / (rank + 1) ** exponent for rank in range(count)))
+
+
+def percentile(timings, fraction):
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the REST API through its real URL routes on a seeded, skewed data set and '
+        'report p50/p99 latency, throughput and query counts per endpoint. The data is created '
+        'inside a transaction that is rolled back afterwards. Requests are sent one at a time '
+        'through the Django test client, so throughput is for a single client.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=30000)
+        parser.add_argument('--likes', type=int, default=50000)
+        parser.add_argument('--follows', type=int, default=20, help='Average follows per user')
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per endpoint')
+        parser.add_argument('--login-requests', type=int, default=20,
+                            help='Measured login requests; each one hashes a password')
+        parser.add_argument('--warmup', type=int, default=10, help='Unmeasured requests per endpoint')
+        parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=ENDPOINTS)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--save', metavar='PATH', help='Write the results as a JSON baseline')
+        parser.add_argument('--compare', metavar='PATH', help='Compare against a saved JSON baseline')
+        parser.add_argument('--max-regression', type=float, default=None, metavar='PERCENT',
+                            help='With --compare, fail if any p99 got worse by more than this')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        # Every login comes from 127.0.0.1; buckets this large still run the
+        # throttle's cache writes but never reject a request
+        rest_framework = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {
+            scope: BENCH_THROTTLE_RATE for scope in api_settings.DEFAULT_THROTTLE_RATES
+        }}
+        with override_settings(REST_FRAMEWORK=rest_framework), transaction.atomic():
+            started = time.perf_counter()
+            data = self.seed(rng, options)
+            self.stdout.write(f'Seeded data set in {time.perf_counter() - started:.1f}s')
+
+            results = {}
+            for name in options['endpoints']:
+                count = options['login_requests'] if name == 'login' else options['requests']
+                results[name] = self.run_endpoint(name, data, rng, count, options['warmup'])
+                self.report(name, results[name])
+
+            transaction.set_rollback(True)
+
+        report = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'options': {
+                    key: options[key]
+                    for key in ('users', 'posts', 'comments', 'likes', 'follows', 'requests', 'seed')
+                },
+            },
+            'endpoints': results,
+        }
+        if options['save']:
+            with open(options['save'], 'w') as baseline_file:
+                json.dump(report, baseline_file, indent=2)
+            self.stdout.write(f'Saved baseline to {options["save"]}')
+        if options['compare']:
+            self.compare(results, options['compare'], options['max_regression'])
+
+    def seed(self, rng, options):
+        user_weights = zipf_weights(options['users'])
+        password = make_password(BENCH_PASSWORD)
+        prefix = f'bench-{rng.getrandbits(32):08x}'
+
+        users = User.objects.bulk_create([
+            User(username=f'{prefix}-{index}', password=password) for index in range(options['users'])
+        ])
+        # bulk_create skips the signals that create profiles, timelines and the search index
+        Profile.objects.bulk_create([Profile(user=user) for user in users])
+        tokens = Token.objects.bulk_create([Token(key=Token.generate_key(), user=user) for user in users])
+
+        follows = set()
+        for follower in users:
+            for followee in rng.choices(users, cum_weights=user_weights, k=rng.randint(0, options['follows'] * 2)):
+                if followee is not follower:
+                    follows.add((follower.pk, followee.pk))
+        Follow.objects.bulk_create([Follow(follower_id=a, followee_id=b) for a, b in follows], batch_size=5000)
+        followers_count = {}
+        for _, followee_id in follows:
+            followers_count[followee_id] = followers_count.get(followee_id, 0) + 1
+        profiles = list(Profile.objects.filter(user__in=users))
+        for profile in profiles:
+            profile.followers_count = followers_count.get(profile.user_id, 0)
+        Profile.objects.bulk_update(profiles, ['followers_count'], batch_size=5000)
+
+        authors = rng.choices(users, cum_weights=user_weights, k=options['posts'])
+        posts = Post.objects.bulk_create([
+            Post(author=author, title=f'Post {index}', content=' '.join(
+                rng.choice(('lorem', 'ipsum', 'dolor', 'sit', 'amet', 'social', 'media')) for _ in range(30)
+            ))
+            for index, author in enumerate(authors)
+        ], batch_size=5000)
+        # Newest posts are the popular ones
+        posts.reverse()
+        post_weights = zipf_weights(len(posts))
+
+        comments = [
+            Comment(post=post, author=author, content='Nice post')
+            for post, author in zip(
+                rng.choices(posts, cum_weights=post_weights, k=options['comments']),
+                rng.choices(users, cum_weights=user_weights, k=options['comments']),
+            )
+        ]
+        Comment.objects.bulk_create(comments, batch_size=5000)
+
+        likes = set(zip(
+            (post.pk for post in rng.choices(posts, cum_weights=post_weights, k=options['likes'])),
+            (user.pk for user in rng.choices(users, cum_weights=user_weights, k=options['likes'])),
+        ))
+        Like.objects.bulk_create([Like(post_id=a, user_id=b) for a, b in likes], batch_size=5000)
+
+        likes_count, comments_count = {}, {}
+        for post_id, _ in likes:
+            likes_count[post_id] = likes_count.get(post_id, 0) + 1
+        for comment in comments:
+            comments_count[comment.post_id] = comments_count.get(comment.post_id, 0) + 1
+        for post in posts:
+            post.likes_count = likes_count.get(post.pk, 0)
+            post.comments_count = comments_count.get(post.pk, 0)
+        Post.objects.bulk_update(posts, ['likes_count', 'comments_count'], batch_size=5000)
+
+        # What fan-out on write and follow backfills would have stored
+        posts_by_author = {}
+        for post in posts:
+            posts_by_author.setdefault(post.author_id, []).append(post)
+        TimelineEntry.objects.bulk_create([
+            TimelineEntry(owner_id=follower_id, post=post, created_at=post.created_at)
+            for follower_id, followee_id in follows
+            if followers_count[followee_id] <= get_fanout_limit()
+            for post in posts_by_author.get(followee_id, [])[:settings.TIMELINE_BACKFILL_SIZE]
+        ], batch_size=5000)
+        rebuild_index()
+
+        return {
+            'users': users,
+            'user_weights': user_weights,
+            'tokens': {token.user_id: token.key for token in tokens},
+            'posts': posts,
+            'post_weights': post_weights,
+        }
+
+    def build_request(self, name, data, rng):
+        user = rng.choices(data['users'], cum_weights=data['user_weights'])[0]
+        post = rng.choices(data['posts'], cum_weights=data['post_weights'])[0]
+        if name == 'posts_list':
+            return user, 'get', '/api/posts/', None
+        if name == 'post_detail':
+            return user, 'get', f'/api/posts/{post.pk}/', None
+        if name == 'feed':
+            return user, 'get', '/api/posts/feed/', None
+        if name == 'like':
+            return user, 'post', f'/api/posts/{post.pk}/like/', None
+        if name == 'comments':
+            return user, 'get', f'/api/posts/comments/?post_id={post.pk}', None
+        return None, 'post', '/api/users/login/', {'username': user.username, 'password': BENCH_PASSWORD}
+
+    def run_endpoint(self, name, data, rng, count, warmup):
+        client = APIClient(SERVER_NAME='localhost')
+        # Start every endpoint from a cold response cache
+        get_cache().clear()
+
+        timings, query_counts, errors = [], [], 0
+        started = time.perf_counter()
+        for index in range(warmup + count):
+            if index == warmup:
+                started = time.perf_counter()
+            user, method, url, body = self.build_request(name, data, rng)
+            if user is not None:
+                client.credentials(HTTP_AUTHORIZATION=f'Token {data["tokens"][user.pk]}')
+            else:
+                client.credentials()
+
+            with CaptureQueriesContext(connection) as queries:
+                request_started = time.perf_counter()
+                response = getattr(client, method)(url, body, format='json')
+                elapsed = (time.perf_counter() - request_started) * 1000
+            if index < warmup:
+                continue
+            timings.append(elapsed)
+            query_counts.append(len(queries))
+            if response.status_code >= 400:
+                errors += 1
+        total = time.perf_counter() - started
+
+        return {
+            'requests': count,
+            'errors': errors,
+            'p50_ms': round(percentile(timings, 0.5), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2),
+            'mean_ms': round(statistics.mean(timings), 2),
+            'throughput_rps': round(count / total, 1),
+            'queries_mean': round(statistics.mean(query_counts), 2),
+            'queries_max': max(query_counts),
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'{name:>12}: p50 {result["p50_ms"]:8.2f} ms | p99 {result["p99_ms"]:8.2f} ms | '
+            f'{result["throughput_rps"]:8.1f} req/s | queries {result["queries_mean"]:6.2f} '
+            f'(max {result["queries_max"]}) | errors {result["errors"]}'
+        )
+
+    def compare(self, results, path, max_regression):
+        try:
+            with open(path) as baseline_file:
+                baseline = json.load(baseline_file)['endpoints']
+        except (OSError, ValueError, KeyError) as exc:
+            raise CommandError(f'Cannot read baseline {path}: {exc}')
+
+        regressions = []
+        self.stdout.write(f'Compared with {path}:')
+        for name, result in results.items():
+            if name not in baseline:
+                continue
+            before = baseline[name]
+            changes = {
+                key: (result[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+                for key in ('p50_ms', 'p99_ms', 'throughput_rps', 'queries_mean')
+            }
+            self.stdout.write(
+                f'{name:>12}: p50 {changes["p50_ms"]:+7.1f}% | p99 {changes["p99_ms"]:+7.1f}% | '
+                f'throughput {changes["throughput_rps"]:+7.1f}% | queries {changes["queries_mean"]:+7.1f}%'
+            )
+            if max_regression is not None and changes['p99_ms'] > max_regression:
+                regressions.append(name)
+
+        if regressions:
+            raise CommandError(f'p99 regressed by more than {max_regression}% on: {", ".join(regressions)}')
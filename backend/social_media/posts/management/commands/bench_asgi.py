@@ -0,0 +1,157 @@
+import asyncio
+import importlib.util
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from social_media.posts.models import Post
+
+ENDPOINTS = ['posts_list', 'post_detail', 'feed', 'comments']
+PREFIXES = {'sync': '/api/posts/', 'async': '/api/async/posts/'}
+
+
+def percentile(timings, fraction):
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Run the app under uvicorn and load the sync (/api/posts/) and async (/api/async/posts/) '
+        'read endpoints with slow clients at increasing concurrency. Each client sends its '
+        'request in small chunks and reads the response slowly, like a mobile connection. '
+        'Reports throughput, p50/p99 latency and errors per endpoint, mode and concurrency.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', required=True, help='Existing user to authenticate as')
+        parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=ENDPOINTS)
+        parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 10, 50, 100])
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per run')
+        parser.add_argument('--drip-ms', type=float, default=20,
+                            help='Delay between request chunks and response reads')
+        parser.add_argument('--chunk-size', type=int, default=64)
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--workers', type=int, default=1, help='uvicorn worker processes')
+
+    def handle(self, *args, **options):
+        if importlib.util.find_spec('uvicorn') is None:
+            raise CommandError('uvicorn is not installed: pip install uvicorn')
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["username"]}" does not exist')
+        token, _ = Token.objects.get_or_create(user=user)
+        post = Post.objects.order_by('-created_at').first()
+        if post is None and {'post_detail', 'comments'} & set(options['endpoints']):
+            raise CommandError('post_detail and comments need at least one post')
+
+        server = self.start_server(options)
+        try:
+            for name in options['endpoints']:
+                for concurrency in options['concurrency']:
+                    for mode, prefix in PREFIXES.items():
+                        result = asyncio.run(self.run(options, token.key, self.get_path(name, prefix, post), concurrency))
+                        self.report(name, mode, concurrency, result)
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+    def get_path(self, name, prefix, post):
+        if name == 'post_detail':
+            return f'{prefix}{post.pk}/?'
+        if name == 'feed':
+            return f'{prefix}feed/?'
+        if name == 'comments':
+            return f'{prefix}comments/?post_id={post.pk}&'
+        return f'{prefix}?'
+
+    def start_server(self, options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'social_media.settings')}
+        server = subprocess.Popen([
+            sys.executable, '-m', 'uvicorn', 'social_media.asgi:application',
+            '--host', options['host'], '--port', str(options['port']),
+            '--workers', str(options['workers']), '--log-level', 'warning', '--no-access-log',
+        ], cwd=settings.BASE_DIR, env=env)
+
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'uvicorn exited with status {server.returncode}')
+            try:
+                socket.create_connection((options['host'], options['port']), timeout=1).close()
+                return server
+            except OSError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError('uvicorn did not start within 30 seconds')
+
+    async def run(self, options, token_key, path, concurrency):
+        deadline = time.monotonic() + options['duration']
+        timings, errors = [], []
+
+        async def client():
+            while time.monotonic() < deadline:
+                # A unique query string per request keeps the response cache out of the comparison
+                url = f'{path}bench={random.getrandbits(64):x}'
+                started = time.perf_counter()
+                try:
+                    status = await self.slow_request(options, token_key, url)
+                except OSError as exc:
+                    errors.append(type(exc).__name__)
+                    continue
+                timings.append((time.perf_counter() - started) * 1000)
+                if status >= 400:
+                    errors.append(str(status))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        total = time.perf_counter() - started
+        return {
+            'requests': len(timings),
+            'errors': len(errors),
+            'p50_ms': round(percentile(timings, 0.5), 2) if timings else None,
+            'p99_ms': round(percentile(timings, 0.99), 2) if timings else None,
+            'mean_ms': round(statistics.mean(timings), 2) if timings else None,
+            'throughput_rps': round(len(timings) / total, 1),
+        }
+
+    async def slow_request(self, options, token_key, url):
+        reader, writer = await asyncio.open_connection(options['host'], options['port'])
+        try:
+            request = (
+                f'GET {url} HTTP/1.1\r\nHost: {options["host"]}\r\n'
+                f'Authorization: Token {token_key}\r\nConnection: close\r\n\r\n'
+            ).encode()
+            for start in range(0, len(request), options['chunk_size']):
+                writer.write(request[start:start + options['chunk_size']])
+                await writer.drain()
+                await asyncio.sleep(options['drip_ms'] / 1000)
+
+            response = b''
+            while chunk := await reader.read(options['chunk_size'] * 16):
+                response += chunk
+                await asyncio.sleep(options['drip_ms'] / 1000)
+            if not response:
+                raise ConnectionResetError('empty response')
+            return int(response.split(b' ', 2)[1])
+        finally:
+            writer.close()
+
+    def report(self, name, mode, concurrency, result):
+        p50 = f'{result["p50_ms"]:8.2f}' if result['p50_ms'] is not None else '       -'
+        p99 = f'{result["p99_ms"]:8.2f}' if result['p99_ms'] is not None else '       -'
+        self.stdout.write(
+            f'{name:>12} {mode:>5} x{concurrency:<4}: p50 {p50} ms | p99 {p99} ms | '
+            f'{result["throughput_rps"]:8.1f} req/s | requests {result["requests"]} | errors {result["errors"]}'
+        )
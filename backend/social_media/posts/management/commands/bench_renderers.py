@@ -0,0 +1,90 @@
+import io
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from social_media import renderers
+from social_media.posts.models import Post, Comment
+from social_media.posts.serializers import PostSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark encoding and decoding a large PostSerializer payload with DRF\'s JSON, '
+        'orjson and MessagePack. The posts are created inside a transaction that is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=500, help='Posts in the payload')
+        parser.add_argument('--comments', type=int, default=20, help='Comments per post')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per renderer')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            author = self.seed(options['posts'], options['comments'], rng)
+            request = APIRequestFactory().get('/api/posts/')
+            request.user = AnonymousUser()
+            started = time.perf_counter()
+            posts = Post.objects.with_details().filter(author=author)
+            data = PostSerializer(posts, many=True, context={'request': request}).data
+            self.stdout.write(
+                f'Serialized {len(data)} posts in {(time.perf_counter() - started) * 1000:.1f} ms '
+                '(not included below)'
+            )
+            transaction.set_rollback(True)
+
+        candidates = [
+            ('json', JSONRenderer(), JSONParser()),
+            ('orjson', renderers.ORJSONRenderer(), renderers.ORJSONParser()),
+            ('msgpack', renderers.MessagePackRenderer(), renderers.MessagePackParser()),
+        ]
+        if renderers.orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed, ORJSONRenderer falls back to json'))
+        if renderers.msgpack is None:
+            self.stdout.write(self.style.WARNING('msgpack is not installed, skipping it'))
+            candidates.pop()
+
+        for name, renderer, parser in candidates:
+            body = renderer.render(data, renderer.media_type)
+            encode = self.time_run(lambda: renderer.render(data, renderer.media_type), options['repeat'])
+            decode = self.time_run(lambda: parser.parse(io.BytesIO(body)), options['repeat'])
+            self.stdout.write(
+                f'{name:>8}: {len(body) / 1024:9.1f} KiB | encode p50 {encode:7.2f} ms '
+                f'({len(body) / encode / 1000:7.1f} MB/s) | decode p50 {decode:7.2f} ms'
+            )
+
+    def seed(self, posts, comments, rng, batch_size=5000):
+        author = User.objects.create(username=f'bench-render-{rng.random()}')
+        created = Post.objects.bulk_create([
+            Post(
+                author=author,
+                title=f'Post {index} ' + 'é' * rng.randint(0, 5),
+                content=' '.join(f'word{rng.randint(0, 5000)}' for _ in range(rng.randint(20, 80))),
+                comments_count=comments,
+            )
+            for index in range(posts)
+        ], batch_size=batch_size)
+        Comment.objects.bulk_create([
+            Comment(post=post, author=author, content=f'Comment {index} on {post.title}')
+            for post in created
+            for index in range(comments)
+        ], batch_size=batch_size)
+        return author
+
+    def time_run(self, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
@@ -0,0 +1,86 @@
+import itertools
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from social_media.posts.models import Post
+from social_media.posts.search import get_backend, rebuild_index, search_posts
+
+VOCABULARY_SIZE = 20000
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark full-text search against icontains scans on a synthetic corpus. '
+        'The corpus is created inside a transaction that is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000000, help='Number of synthetic posts')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query')
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        if backend == 'basic':
+            self.stdout.write(self.style.WARNING('No full-text index on this database, comparing scans only'))
+
+        rng = random.Random(options['seed'])
+        # Zipf-like vocabulary so some terms are common and most are rare
+        words = [f'w{index}' for index in range(VOCABULARY_SIZE)]
+        cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(VOCABULARY_SIZE)))
+        terms = [words[10], words[500], words[5000], f'{words[10]} {words[500]}']
+
+        with transaction.atomic():
+            started = time.perf_counter()
+            self.seed_corpus(options['posts'], rng, words, cum_weights)
+            self.stdout.write(f'Seeded {options["posts"]} posts in {time.perf_counter() - started:.1f}s')
+
+            started = time.perf_counter()
+            rebuild_index()
+            self.stdout.write(f'Built {backend} index in {time.perf_counter() - started:.1f}s')
+
+            for term in terms:
+                indexed = self.time_query(
+                    lambda: list(search_posts(Post.objects.all(), term)[:options['page_size']]),
+                    options['repeat'],
+                )
+                scanned = self.time_query(
+                    lambda: list(
+                        Post.objects.filter(Q(title__icontains=term) | Q(content__icontains=term))
+                        [:options['page_size']]
+                    ),
+                    options['repeat'],
+                )
+                self.stdout.write(
+                    f'{term!r:>14}: {backend} p50 {indexed:8.1f} ms | icontains p50 {scanned:8.1f} ms'
+                )
+
+            transaction.set_rollback(True)
+
+    def seed_corpus(self, count, rng, words, cum_weights, batch_size=5000):
+        author = User.objects.create(username=f'bench-search-{rng.random()}')
+        for start in range(0, count, batch_size):
+            posts = []
+            for _ in range(min(batch_size, count - start)):
+                posts.append(Post(
+                    author=author,
+                    title=' '.join(rng.choices(words, cum_weights=cum_weights, k=5)),
+                    content=' '.join(rng.choices(words, cum_weights=cum_weights, k=40)),
+                ))
+            # bulk_create skips the post_save signals, so the index is rebuilt afterwards
+            Post.objects.bulk_create(posts)
+
+    def time_query(self, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,77 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from social_media.posts.models import Post, Comment, Like, TimelineEntry
+
+# Placeholder ids: EXPLAIN only needs the shape of the query
+USER_ID = 1
+POST_ID = 1
+PAGE_POST_IDS = list(range(1, 21))
+PAGE_SIZE = 21
+
+# SQLite reports "SCAN <table>" without an index for a full table scan,
+# PostgreSQL reports "Seq Scan on <table>"
+FULL_SCAN_PATTERNS = [
+    re.compile(r'\bSCAN (?!.*\bUSING\b.*\bINDEX\b)(?!.*VIRTUAL TABLE)\S+'),
+    re.compile(r'\bSeq Scan on\b'),
+]
+
+
+def get_hot_queries():
+    """
+    The main query behind each endpoint, as issued by the views.
+    """
+    return {
+        'PostViewSet.list': Post.objects.order_by('-created_at', '-id')[:PAGE_SIZE],
+        'PostViewSet.retrieve': Post.objects.filter(pk=POST_ID),
+        'PostViewSet.feed (everyone)': Post.objects.exclude(author_id=USER_ID).order_by(
+            '-created_at', '-id'
+        )[:PAGE_SIZE],
+        'PostViewSet.feed (timeline)': TimelineEntry.objects.filter(owner_id=USER_ID).order_by(
+            '-created_at', '-post_id'
+        ).values('created_at', 'post_id')[:PAGE_SIZE],
+        'PostViewSet.my_posts': Post.objects.filter(author_id=USER_ID),
+        'PostViewSet.trending': Post.objects.order_by('-hot_score', '-id')[:PAGE_SIZE],
+        'PostViewSet.like': Like.objects.filter(post_id=POST_ID, user_id=USER_ID),
+        'PostSerializer.comments': Comment.objects.filter(post_id__in=PAGE_POST_IDS),
+        'PostSerializer.is_liked': Like.objects.filter(
+            user_id=USER_ID, post_id__in=PAGE_POST_IDS
+        ).values_list('post_id', flat=True),
+        'CommentViewSet.list': Comment.objects.filter(post_id=POST_ID),
+    }
+
+
+def find_full_scans(plan):
+    return [
+        line.strip() for line in plan.splitlines()
+        if any(pattern.search(line) for pattern in FULL_SCAN_PATTERNS)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Run EXPLAIN for the main query of each posts endpoint and fail if any '
+        'of them falls back to a full table scan'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan')
+
+    def handle(self, *args, **options):
+        failures = []
+        for name, queryset in get_hot_queries().items():
+            plan = queryset.explain()
+            full_scans = find_full_scans(plan)
+            if options['verbose_plans'] or full_scans:
+                self.stdout.write(f'{name}:\n{plan}\n')
+            if full_scans:
+                failures.append(f'{name}: {"; ".join(full_scans)}')
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{name}: ok'))
+
+        if failures:
+            raise CommandError(
+                f'Full table scans on {connection.vendor}:\n' + '\n'.join(failures)
+            )
@@ -0,0 +1,42 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from social_media.posts.export import EXPORT_TYPES, iter_ndjson, gzip_blocks, parse_updated_since
+
+
+class Command(BaseCommand):
+    help = (
+        'Write posts, comments and likes as NDJSON, one JSON object per line, in constant memory. '
+        'Use --updated-since for incremental exports.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', help='File to write (default: stdout)')
+        parser.add_argument('--gzip', action='store_true', help='Gzip the output')
+        parser.add_argument('--updated-since', help='ISO 8601 date or datetime')
+        parser.add_argument('--types', nargs='+', choices=list(EXPORT_TYPES), default=list(EXPORT_TYPES))
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched per query')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        updated_since = None
+        if options['updated_since']:
+            try:
+                updated_since = parse_updated_since(options['updated_since'])
+            except ValueError as exc:
+                raise CommandError(str(exc))
+
+        blocks = iter_ndjson(options['types'], updated_since, options['chunk_size'], options['database'])
+        if options['gzip']:
+            blocks = gzip_blocks(blocks)
+
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for block in blocks:
+                output.write(block)
+        finally:
+            if options['output']:
+                output.close()
+            else:
+                output.flush()
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from social_media.posts.cache import invalidate_all
+from social_media.posts.models import Post, Comment, Like
+from .recompute_hot_scores import recompute_hot_scores
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute Post.likes_count and Post.comments_count from the Like and Comment tables, '
+        'then Post.hot_score from the new counters. Run it after deletes that bypass the API '
+        '(admin, cascades, bulk scripts), which leave the counters drifted'
+    )
+
+    def handle(self, *args, **options):
+        likes = Like.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(
+            total=Count('pk')
+        ).values('total')
+        comments = Comment.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(
+            total=Count('pk')
+        ).values('total')
+
+        updated = Post.objects.update(
+            likes_count=Coalesce(Subquery(likes), 0),
+            comments_count=Coalesce(Subquery(comments), 0),
+        )
+        # Scores follow the counters
+        recompute_hot_scores(Post.objects.all())
+        # Bulk updates bypass the signals that invalidate cached responses
+        invalidate_all()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt counters and hot scores for {updated} posts'))
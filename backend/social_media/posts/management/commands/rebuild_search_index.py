@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from social_media.posts.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for posts'
+
+    def handle(self, *args, **options):
+        backend = rebuild_index()
+        if backend == 'basic':
+            self.stdout.write(self.style.WARNING('No full-text index on this database, nothing to rebuild'))
+            return
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {backend} search index'))
@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from social_media.posts.models import Post
+from social_media.posts.trending import hot_score_expression
+
+
+def recompute_hot_scores(posts, batch_size=1000):
+    """
+    Reset hot_score for ``posts`` from their counters. The counters are read
+    by the UPDATE itself, so concurrent likes and comments are not lost.
+    """
+    rows = posts.order_by('pk').values_list('pk', 'created_at')
+    batch, updated = [], 0
+    for pk, created_at in rows.iterator(chunk_size=batch_size):
+        batch.append(Post(pk=pk, hot_score=hot_score_expression(created_at)))
+        if len(batch) == batch_size:
+            updated += Post.objects.bulk_update(batch, ['hot_score'])
+            batch = []
+    if batch:
+        updated += Post.objects.bulk_update(batch, ['hot_score'])
+    return updated
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute Post.hot_score from the like and comment counters. Writes keep scores up to '
+        'date incrementally; run this periodically to correct drift and after changing '
+        'POSTS_TRENDING_COMMENT_WEIGHT or POSTS_TRENDING_DECAY_SECONDS.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Only posts created in the last N days (default: all)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        posts = Post.objects.all()
+        if options['days'] is not None:
+            posts = posts.filter(created_at__gte=timezone.now() - timedelta(days=options['days']))
+        updated = recompute_hot_scores(posts, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Recomputed hot scores for {updated} posts'))
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.8 on 2026-10-16 23:03
+
+from django.db import migrations, models
+import social_media.posts.trending
+
+
+def backfill_hot_scores(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    posts = [
+        Post(pk=pk, hot_score=social_media.posts.trending.hot_score_expression(created_at))
+        for pk, created_at in Post.objects.values_list('pk', 'created_at').iterator()
+    ]
+    Post.objects.bulk_update(posts, ['hot_score'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='hot_score',
+            field=models.FloatField(default=social_media.posts.trending.get_initial_hot_score),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-hot_score', '-id'], name='posts_post_hot'),
+        ),
+        migrations.RunPython(backfill_hot_scores, migrations.RunPython.noop),
+    ]
@@ -1,16 +1,65 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from social_media.users.models import Follow, Profile, author_changed
+from .trending import get_initial_hot_score
+
+
+def get_comments_prefetch(comment_limit=None):
+    """
+    Prefetch of the comments PostSerializer embeds. With ``comment_limit``
+    only the newest comments of each post are loaded, into ``recent_comments``.
+    """
+    comments = Comment.objects.select_related('author__profile')
+    if comment_limit is None:
+        return models.Prefetch('comments', queryset=comments)
+    return models.Prefetch(
+        'comments',
+        queryset=comments.order_by('-created_at', '-id')[:comment_limit],
+        to_attr='recent_comments',
+    )
+
+
+class PostQuerySet(models.QuerySet):
+    def with_details(self, comment_limit=None):
+        """
+        Preload everything PostSerializer reads so that serializing any number
+        of posts costs a fixed number of queries.
+        """
+        return self.select_related('author__profile').prefetch_related(get_comments_prefetch(comment_limit))
+
 
 class Post(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts')
     title = models.CharField(max_length=200)
     content = models.TextField()
     image = models.ImageField(upload_to='post_images', blank=True, null=True)
+    # Resized, EXIF-free copies written by the image pipeline (social_media.images)
+    image_variants = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized counters, maintained with F() updates by the API's write
+    # views. Writes that bypass them (admin deletes, cascades from a deleted
+    # user, bulk scripts) leave the counters drifted; the
+    # rebuild_post_counters management command recomputes them.
+    likes_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+    # Time-decayed engagement rank for the trending list (see posts/trending.py)
+    hot_score = models.FloatField(default=get_initial_hot_score)
+    
+    objects = PostQuerySet.as_manager()
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Feed and list pages, newest first
+            models.Index(fields=['-created_at', '-id'], name='posts_post_recent'),
+            # my_posts
+            models.Index(fields=['author', '-created_at', '-id'], name='posts_post_author_recent'),
+            # trending
+            models.Index(fields=['-hot_score', '-id'], name='posts_post_hot'),
+        ]
     
     def __str__(self):
         return self.title
@@ -24,6 +73,9 @@ class Comment(models.Model):
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['post', 'created_at', 'id'], name='posts_comment_post_created'),
+        ]
     
     def __str__(self):
         return f"Comment by {self.author.username} on {self.post.title}"
@@ -36,6 +88,79 @@ class Like(models.Model):
     
     class Meta:
         unique_together = ('post', 'user')
+        indexes = [
+            # The caller's likes on a page of posts (PostListSerializer)
+            models.Index(fields=['user', 'post'], name='posts_like_user_post'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} likes {self.post.title}" 
+
+
+class TimelineEntry(models.Model):
+    """
+    A post materialized into one follower's home timeline at write time.
+    """
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    # Copy of post.created_at so a feed page is a range read on one index
+    created_at = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ('owner', 'post')
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-post'], name='posts_timeline_owner_recent'),
+        ]
     
     def __str__(self):
-        return f"{self.user.username} likes {self.post.title}" 
\ No newline at end of file
+        return f"Post {self.post_id} in {self.owner_id}'s timeline"
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, **kwargs):
+    if created:
+        from .timelines import fan_out_post
+        fan_out_post(instance)
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, **kwargs):
+    from .search import index_post
+    index_post(instance)
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    from .search import remove_post
+    remove_post(instance.pk)
+
+@receiver([post_save, post_delete], sender=Post)
+def invalidate_cached_post(sender, instance, **kwargs):
+    from .cache import invalidate_post
+    invalidate_post(instance.pk)
+
+@receiver([post_save, post_delete], sender=Comment)
+@receiver([post_save, post_delete], sender=Like)
+def invalidate_cached_post_activity(sender, instance, **kwargs):
+    from .cache import invalidate_post
+    invalidate_post(instance.post_id)
+
+@receiver(post_save, sender=Profile)
+def invalidate_cached_authors(sender, instance, **kwargs):
+    # Author names and profiles are embedded in every post payload
+    from .cache import invalidate_all
+    invalidate_all()
+
+@receiver(author_changed)
+def invalidate_renamed_author(sender, user, **kwargs):
+    from .cache import invalidate_all
+    invalidate_all()
+
+@receiver(post_save, sender=Follow)
+def backfill_followed_posts(sender, instance, created, **kwargs):
+    if created:
+        from .timelines import backfill_timeline
+        backfill_timeline(instance.follower_id, instance.followee_id)
+
+@receiver(post_delete, sender=Follow)
+def purge_unfollowed_posts(sender, instance, **kwargs):
+    from .timelines import purge_timeline
+    purge_timeline(instance.follower_id, instance.followee_id)
@@ -0,0 +1,190 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class Setting:
+    """
+    A class attribute read from settings on every access, so page sizes
+    follow override_settings. Instances may still assign their own value.
+    """
+    def __init__(self, name, default):
+        self.name = name
+        self.default = default
+
+    def __get__(self, instance, owner=None):
+        return getattr(settings, self.name, self.default)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a pair of ordering fields.
+
+    The cursor holds the ordering values of the last row on the page, so the
+    next page is an indexed range read instead of an OFFSET scan.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_querysets([queryset], request, view=view)
+
+    def paginate_querysets(self, querysets, request, view=None):
+        """
+        Paginate the merge of several querysets that share the ordering
+        fields, such as a materialized timeline plus rows merged at read time.
+        """
+        results = []
+        for queryset in self.get_page_querysets(querysets, request):
+            results.extend(queryset)
+        return self.set_page(results, merged=len(querysets) > 1)
+
+    async def apaginate_querysets(self, querysets, request, view=None):
+        """
+        paginate_querysets() for async views.
+        """
+        results = []
+        for queryset in self.get_page_querysets(querysets, request):
+            results.extend([row async for row in queryset.aiterator()])
+        return self.set_page(results, merged=len(querysets) > 1)
+
+    def get_page_querysets(self, querysets, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.field_names = [field.lstrip('-') for field in self.ordering]
+        self.descending = self.ordering[0].startswith('-')
+        cursor = self.decode_cursor(request, querysets[0].model)
+
+        page_querysets = []
+        for queryset in querysets:
+            queryset = queryset.order_by(*self.ordering)
+            if cursor is not None:
+                queryset = queryset.filter(self.get_cursor_filter(cursor))
+            # Fetch one extra row to know whether there is a next page
+            page_querysets.append(queryset[:self.page_size + 1])
+        return page_querysets
+
+    def set_page(self, results, merged=False):
+        if merged:
+            results.sort(key=self.get_row_key, reverse=self.descending)
+            # The same row may come from more than one source
+            results = [
+                row for index, row in enumerate(results)
+                if index == 0 or self.get_row_key(row) != self.get_row_key(results[index - 1])
+            ]
+
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_row_key(self, row):
+        if isinstance(row, dict):
+            return tuple(row[name] for name in self.field_names)
+        return tuple(getattr(row, name) for name in self.field_names)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_cursor_filter(self, cursor):
+        lookup = 'lt' if self.descending else 'gt'
+        first, second = self.field_names
+        first_value, second_value = cursor
+        return (
+            Q(**{f'{first}__{lookup}': first_value}) |
+            Q(**{first: first_value, f'{second}__{lookup}': second_value})
+        )
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            if len(values) != len(self.field_names):
+                raise ValueError
+            return [
+                model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.field_names, values)
+            ]
+        except (TypeError, ValueError, ValidationError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance):
+        values = [
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in self.get_row_key(instance)
+        ]
+        return base64.urlsafe_b64encode(json.dumps(values).encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+class FeedPagination(KeysetPagination):
+    """
+    Newest-first feed pages keyed on (created_at, id).
+    """
+    ordering = ('-created_at', '-id')
+    page_size = Setting('POSTS_FEED_PAGE_SIZE', 20)
+    max_page_size = Setting('POSTS_FEED_MAX_PAGE_SIZE', 100)
+
+
+class HomeTimelinePagination(FeedPagination):
+    """
+    Feed pages merged from (created_at, post_id) timeline rows.
+    """
+    ordering = ('-created_at', '-post_id')
+
+
+class CommentPagination(KeysetPagination):
+    """
+    Oldest-first comment pages keyed on (created_at, id).
+    """
+    ordering = ('created_at', 'id')
+    page_size = Setting('POSTS_COMMENTS_PAGE_SIZE', 50)
+    max_page_size = Setting('POSTS_COMMENTS_MAX_PAGE_SIZE', 200)
+
+
+class SearchPagination(PageNumberPagination):
+    """
+    Numbered pages for relevance-ranked search results, which have no
+    stable keyset to seek on.
+    """
+    page_size = Setting('POSTS_SEARCH_PAGE_SIZE', 20)
+    page_size_query_param = 'page_size'
+    max_page_size = Setting('POSTS_SEARCH_MAX_PAGE_SIZE', 100)
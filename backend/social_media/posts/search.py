@@ -0,0 +1,140 @@
+"""
+Full-text search over post titles and content.
+
+On SQLite posts are mirrored into an FTS5 table (kept in sync by the Post
+signals in models.py) and ranked with bm25(). On PostgreSQL an expression
+GIN index over to_tsvector() is used, which the database maintains itself.
+Any other backend falls back to the icontains scan DRF's SearchFilter does.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+
+# Must match the expression of the GIN index created in the migration
+PG_DOCUMENT = "to_tsvector('english'::regconfig, coalesce(title, '') || ' ' || coalesce(content, ''))"
+PG_QUERY = "websearch_to_tsquery('english'::regconfig, %s)"
+
+
+def get_backend():
+    backend = getattr(settings, 'POSTS_SEARCH_BACKEND', 'auto')
+    if backend != 'auto':
+        return backend
+    if connection.vendor == 'sqlite':
+        return 'fts5'
+    if connection.vendor == 'postgresql':
+        return 'postgres'
+    return 'basic'
+
+
+def build_fts5_query(term):
+    """
+    Turn free text into an FTS5 query: every word must match as a prefix.
+    Quoting each word keeps FTS5 operators in user input from being parsed.
+    """
+    words = re.findall(r'\w+', term)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_posts(queryset, term):
+    """
+    Filter a Post queryset to matches for ``term``, annotated with
+    ``search_rank`` (higher is more relevant) and ordered by it.
+    """
+    backend = get_backend()
+    if backend == 'fts5':
+        query = build_fts5_query(term)
+        if not query:
+            return queryset.none()
+        # MATCH picks the ids once; bm25() only works inside a full-text
+        # query, so each hit is ranked by a rowid lookup in the index.
+        # bm25() is lower for better matches, so negate it
+        rank = RawSQL(
+            f'SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = {Post._meta.db_table}.id',
+            [query],
+        )
+        queryset = queryset.filter(pk__in=get_matching_post_ids(term))
+    elif backend == 'postgres':
+        rank = RawSQL(f'ts_rank({PG_DOCUMENT}, {PG_QUERY})', [term])
+        queryset = queryset.filter(
+            RawSQL(f'{PG_DOCUMENT} @@ {PG_QUERY}', [term], output_field=BooleanField())
+        )
+    else:
+        return queryset.filter(Q(title__icontains=term) | Q(content__icontains=term))
+    return queryset.annotate(search_rank=rank).order_by('-search_rank', '-created_at', '-id')
+
+
+def get_matching_post_ids(term):
+    """
+    The ids of posts matching ``term``, for use as a subquery
+    (``post__in=...``) where search_posts' joins and ranking do not fit.
+    """
+    backend = get_backend()
+    if backend == 'fts5':
+        query = build_fts5_query(term)
+        if not query:
+            return Post.objects.none().values('pk')
+        return RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [query])
+    return search_posts(Post.objects.all(), term).order_by().values('pk')
+
+
+def index_post(post):
+    if get_backend() != 'fts5':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, content) VALUES (%s, %s, %s)',
+            [post.pk, post.title, post.content],
+        )
+
+
+def remove_post(post_id):
+    if get_backend() != 'fts5':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild_index():
+    """
+    Rebuild the search index from the posts table. Returns the backend used.
+    """
+    backend = get_backend()
+    with connection.cursor() as cursor:
+        if backend == 'fts5':
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, content) '
+                f'SELECT id, title, content FROM posts_post'
+            )
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        elif backend == 'postgres':
+            cursor.execute('REINDEX INDEX posts_post_search_gin')
+    return backend
+
+
+class PostSearchFilter(BaseFilterBackend):
+    """
+    Drop-in replacement for SearchFilter on ``?search=`` backed by the
+    full-text index, ordered by relevance.
+    """
+    search_param = api_settings.SEARCH_PARAM
+
+    def get_search_term(self, request):
+        return request.query_params.get(self.search_param, '').strip()
+
+    def filter_queryset(self, request, queryset, view):
+        term = self.get_search_term(request)
+        if not term:
+            return queryset
+        return search_posts(queryset, term)
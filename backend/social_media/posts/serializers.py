@@ -1,12 +1,17 @@
 from rest_framework import serializers
+from django.conf import settings
+from django.db import models
 from .models import Post, Comment, Like
 from django.contrib.auth.models import User
 from social_media.users.models import Profile
+from social_media.images import ImageVariantsField
 
 class ProfileSerializer(serializers.ModelSerializer):
+    profile_picture_srcset = ImageVariantsField(source='profile_picture_variants')
+    
     class Meta:
         model = Profile
-        fields = ['bio', 'profile_picture', 'date_joined']
+        fields = ['bio', 'profile_picture', 'profile_picture_srcset', 'date_joined']
         read_only_fields = ['date_joined']
 
 class AuthorSerializer(serializers.ModelSerializer):
@@ -40,27 +45,81 @@ class LikeSerializer(serializers.ModelSerializer):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
+class LikeSyncSerializer(serializers.Serializer):
+    """
+    Likes and unlikes queued by a client while offline.
+    """
+    like = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), default=list,
+        max_length=settings.POSTS_LIKE_SYNC_MAX_IDS
+    )
+    unlike = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), default=list,
+        max_length=settings.POSTS_LIKE_SYNC_MAX_IDS
+    )
+    
+    def validate(self, attrs):
+        if set(attrs['like']) & set(attrs['unlike']):
+            raise serializers.ValidationError('A post cannot be both liked and unliked')
+        return attrs
+
+class PostListSerializer(serializers.ListSerializer):
+    """
+    Resolves is_liked for a whole page of posts with a single query.
+    """
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        request = self.context.get('request')
+        # The async views resolve likes themselves and pass them in
+        if 'liked_post_ids' not in self.context and request is not None and request.user.is_authenticated:
+            post_ids = [post.pk for post in iterable]
+            self.context['liked_post_ids'] = set(
+                Like.objects.filter(user=request.user, post_id__in=post_ids)
+                .values_list('post_id', flat=True)
+            )
+        return super().to_representation(iterable)
+
 class PostSerializer(serializers.ModelSerializer):
     author = AuthorSerializer(read_only=True)
     comments = CommentSerializer(many=True, read_only=True)
-    likes_count = serializers.SerializerMethodField()
+    image_srcset = ImageVariantsField(source='image_variants')
     is_liked = serializers.SerializerMethodField()
     
     class Meta:
         model = Post
-        fields = ['id', 'author', 'title', 'content', 'image', 
-                  'created_at', 'updated_at', 'comments', 'likes_count', 'is_liked']
-        read_only_fields = ['id', 'author', 'created_at', 'updated_at']
+        fields = ['id', 'author', 'title', 'content', 'image', 'image_srcset',
+                  'created_at', 'updated_at', 'comments', 'likes_count', 'comments_count',
+                  'is_liked']
+        read_only_fields = ['id', 'author', 'created_at', 'updated_at',
+                            'likes_count', 'comments_count']
+        list_serializer_class = PostListSerializer
     
     def create(self, validated_data):
         validated_data['author'] = self.context['request'].user
         return super().create(validated_data)
     
-    def get_likes_count(self, obj):
-        return obj.likes.count()
-    
     def get_is_liked(self, obj):
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
-        return obj.likes.filter(user=user).exists() 
\ No newline at end of file
+        # List responses resolve every like on the page up front
+        liked_post_ids = self.context.get('liked_post_ids')
+        if liked_post_ids is not None:
+            return obj.pk in liked_post_ids
+        return obj.likes.filter(user=user).exists() 
+
+class CompactPostSerializer(PostSerializer):
+    """
+    Post with only its newest comments; the rest are paged through
+    CommentViewSet and comments_count gives the total.
+    """
+    comments = serializers.SerializerMethodField()
+    
+    def get_comments(self, obj):
+        recent_comments = getattr(obj, 'recent_comments', None)
+        if recent_comments is None:
+            limit = settings.POSTS_COMMENTS_PREVIEW_SIZE
+            recent_comments = obj.comments.select_related('author__profile').order_by('-created_at', '-id')[:limit]
+        # Oldest first, like the full representation
+        recent_comments = list(recent_comments)[::-1]
+        return CommentSerializer(recent_comments, many=True, context=self.context).data
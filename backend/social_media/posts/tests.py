@@ -0,0 +1,737 @@
+import asyncio
+import gzip
+import io
+import json
+import math
+import os
+import re
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from social_media import metrics, renderers
+from social_media.throttling import TokenBucket
+from social_media.users.authentication import token_cache
+from social_media.users.models import Follow
+from . import events
+from .async_views import stream_events
+from .models import Post, Comment, Like
+from .search import rebuild_index
+from .management.commands.check_query_plans import get_hot_queries, find_full_scans
+
+
+class AuthorCacheTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='author', password='password')
+        self.post = Post.objects.create(author=self.user, title='Title', content='Content')
+        self.client.force_authenticate(self.user)
+
+    def test_renamed_author_invalidates_cached_posts(self):
+        url = f'/api/posts/{self.post.pk}/'
+        response = self.client.get(url)
+        self.assertEqual(response.data['author']['first_name'], '')
+        etag = response['ETag']
+
+        response = self.client.put('/api/users/update_profile/', {'first_name': 'Renamed'})
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['author']['first_name'], 'Renamed')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_last_login_keeps_cached_posts(self):
+        url = f'/api/posts/{self.post.pk}/'
+        etag = self.client.get(url)['ETag']
+
+        user = User.objects.get(pk=self.user.pk)
+        user.save(update_fields=['last_login'])
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_unchanged_name_saves_nothing(self):
+        url = f'/api/posts/{self.post.pk}/'
+        etag = self.client.get(url)['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put('/api/users/update_profile/', {'first_name': '', 'last_name': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE')])
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class ResponseCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.post = Post.objects.create(author=self.author, title='Title', content='Content')
+        self.client.force_authenticate(self.reader)
+
+    def test_not_modified(self):
+        for url in ('/api/posts/', f'/api/posts/{self.post.pk}/'):
+            etag = self.client.get(url)['ETag']
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response['ETag'], etag)
+
+    def test_etag_is_per_user(self):
+        url = f'/api/posts/{self.post.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.client.force_authenticate(self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_like_and_comment_bump_version(self):
+        list_etag = self.client.get('/api/posts/')['ETag']
+        detail_etag = self.client.get(f'/api/posts/{self.post.pk}/')['ETag']
+
+        self.client.post(f'/api/posts/{self.post.pk}/like/')
+        self.client.post(f'/api/posts/{self.post.pk}/comment/', {'content': 'Comment'})
+
+        response = self.client.get(f'/api/posts/{self.post.pk}/', HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['likes_count'], response.data['comments_count']), (1, 1))
+        self.assertTrue(response.data['is_liked'])
+        response = self.client.get('/api/posts/', HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data[0]['likes_count'], response.data[0]['comments_count']), (1, 1))
+
+
+class PostListQueryTests(APITestCase):
+    """
+    A 100-post page costs the same number of queries as a 1-post page.
+    """
+    page_size = 100
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='password')
+        self.viewer = User.objects.create_user(username='viewer', password='password')
+        posts = Post.objects.bulk_create([
+            Post(author=author, title=f'Post {index}', content='Content')
+            for author in (self.author, self.viewer)
+            for index in range(self.page_size)
+        ])
+        Comment.objects.bulk_create([
+            Comment(post=post, author=self.viewer, content='Comment')
+            for post in posts for _ in range(5)
+        ])
+        Like.objects.bulk_create([Like(post=post, user=self.viewer) for post in posts[::2]])
+        self.client.force_authenticate(self.viewer)
+
+    def get(self, url, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, {'page_size': self.page_size})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list(self):
+        # Posts, recent comments, likes on the page
+        response = self.get('/api/posts/', 3)
+        self.assertEqual(len(response.data), self.page_size * 2)
+        self.assertEqual(sum(post['is_liked'] for post in response.data), self.page_size)
+
+    def test_my_posts(self):
+        response = self.get('/api/posts/my_posts/', 3)
+        self.assertEqual(len(response.data), self.page_size)
+
+    def test_feed_without_follows(self):
+        # Follow check, posts, recent comments, likes on the page
+        response = self.get('/api/posts/feed/', 4)
+        self.assertEqual(len(response.data['results']), self.page_size)
+        self.assertTrue(all(post['author']['username'] == 'author' for post in response.data['results']))
+
+    @override_settings(POSTS_FEED_PAGE_SIZE=7, POSTS_FEED_MAX_PAGE_SIZE=10)
+    def test_feed_page_size_settings(self):
+        self.assertEqual(len(self.client.get('/api/posts/feed/').data['results']), 7)
+        response = self.client.get('/api/posts/feed/', {'page_size': self.page_size})
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_feed_from_timeline(self):
+        Follow.objects.create(follower=self.viewer, followee=self.author)
+        # Follow check, merged authors, timeline rows, posts, recent comments,
+        # likes on the page
+        response = self.get('/api/posts/feed/', 6)
+        self.assertEqual(len(response.data['results']), self.page_size)
+
+
+class SearchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        # Created first, so only the rank can put it ahead of the newer post
+        self.focused = Post.objects.create(
+            author=self.author, title='Python tips', content='Python generators and python typing',
+        )
+        self.passing = Post.objects.create(
+            author=self.author, title='Weekend plans', content='Maybe some gardening and a python script',
+        )
+        Post.objects.create(author=self.author, title='Cooking', content='Pasta tonight')
+
+    def search(self, term):
+        response = self.client.get('/api/posts/', {'search': term})
+        self.assertEqual(response.status_code, 200)
+        return [post['id'] for post in response.data['results']]
+
+    def test_ranked_prefix_matches(self):
+        self.assertEqual(self.search('pyth'), [self.focused.pk, self.passing.pk])
+        self.assertEqual(self.search('python gardening'), [self.passing.pk])
+
+    def test_junk_queries(self):
+        for term in ['"*)(', 'NOT', 'title:', '-']:
+            with self.subTest(term=term):
+                self.assertEqual(self.search(term), [])
+
+    def test_index_follows_edits_and_deletes(self):
+        self.passing.content = 'Gardening only'
+        self.passing.save()
+        self.assertEqual(self.search('python'), [self.focused.pk])
+        self.assertEqual(self.search('gardening'), [self.passing.pk])
+        self.focused.delete()
+        self.assertEqual(self.search('python'), [])
+
+    @override_settings(POSTS_SEARCH_PAGE_SIZE=1, POSTS_SEARCH_MAX_PAGE_SIZE=1)
+    def test_page_size_settings(self):
+        self.assertEqual(self.search('python'), [self.focused.pk])
+        response = self.client.get('/api/posts/', {'search': 'python', 'page_size': 5})
+        self.assertEqual(len(response.data['results']), 1)
+
+
+@override_settings(REQUEST_METRICS_ENABLED=True)
+class MetricsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            author=User.objects.create_user(username='author'), title='Title', content='Content',
+        )
+        patcher = mock.patch.object(metrics, 'registry', metrics.MetricsRegistry())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_server_timing_and_metrics(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/posts/{self.post.pk}/')
+        # Read now, since the next request resets the connection's query log
+        query_count = len(queries)
+        self.assertEqual(response.status_code, 200)
+        timing = re.fullmatch(
+            r'db;dur=[\d.]+;desc="(\d+) queries", ser;dur=[\d.]+, total;dur=[\d.]+', response['Server-Timing'],
+        )
+        self.assertIsNotNone(timing)
+        self.assertEqual(int(timing.group(1)), query_count)
+
+        response = self.client.get('/metrics/')
+        self.assertEqual(response.status_code, 200)
+        lines = response.content.decode().splitlines()
+        self.assertIn('http_requests_total{view="PostViewSet.retrieve"} 1', lines)
+        self.assertIn(f'http_request_db_queries_total{{view="PostViewSet.retrieve"}} {query_count}', lines)
+        self.assertIn('http_request_duration_seconds_count{view="PostViewSet.retrieve"} 1', lines)
+
+    @override_settings(REQUEST_METRICS_MAX_QUERIES=0)
+    def test_slow_request_log(self):
+        with self.assertLogs('social_media.metrics', 'WARNING') as logs:
+            self.client.get(f'/api/posts/{self.post.pk}/')
+        self.assertIn('PostViewSet.retrieve', logs.output[0])
+        self.assertIn('posts_post', logs.output[0])
+
+    @override_settings(REQUEST_METRICS_ALLOWED_IPS=[])
+    def test_metrics_hidden_from_other_addresses(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 404)
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.post = Post.objects.create(author=author, title='First', content='Content')
+        Post.objects.create(author=author, title='Second', content='Content')
+        Comment.objects.create(post=self.post, author=self.reader, content='Comment')
+        Like.objects.create(post=self.post, user=self.reader)
+        self.headers = {'Authorization': f'Token {Token.objects.create(user=self.reader).key}'}
+        self.sync_client = APIClient()
+        self.sync_client.credentials(HTTP_AUTHORIZATION=self.headers['Authorization'])
+
+    async def test_payloads_match_sync_views(self):
+        for sync_url, async_url in [
+            ('/api/posts/', '/api/async/posts/'),
+            (f'/api/posts/{self.post.pk}/', f'/api/async/posts/{self.post.pk}/'),
+            ('/api/posts/feed/', '/api/async/posts/feed/'),
+            (f'/api/posts/comments/?post_id={self.post.pk}', f'/api/async/posts/comments/?post_id={self.post.pk}'),
+        ]:
+            with self.subTest(url=async_url):
+                expected = await sync_to_async(self.sync_client.get)(sync_url)
+                response = await self.async_client.get(async_url, headers=self.headers)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), json.loads(expected.content))
+
+    async def test_feed_needs_authentication(self):
+        response = await self.async_client.get('/api/async/posts/feed/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+        response = await self.async_client.get('/api/async/posts/feed/', headers={'Authorization': 'Token invalid'})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_invalid_input(self):
+        response = await self.async_client.get('/api/async/posts/feed/', {'cursor': 'junk'}, headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get('/api/async/posts/comments/', {'post_id': 'abc'}, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('post_id', response.json())
+        self.assertEqual((await self.async_client.get('/api/async/posts/0/')).status_code, 404)
+        self.assertEqual((await self.async_client.post('/api/async/posts/')).status_code, 405)
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='password')
+        post = Post.objects.create(author=self.admin, title='Title', content='Content')
+        Comment.objects.create(post=post, author=self.admin, content='Comment')
+        Like.objects.create(post=post, user=self.admin)
+
+    def test_export(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/posts/export/', {'gzip': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.is_async)
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual([json.loads(line)['type'] for line in lines], ['post', 'comment', 'like'])
+
+    async def test_export_streams_under_asgi(self):
+        client = AsyncClient()
+        await sync_to_async(client.force_login)(self.admin)
+        response = await client.get('/api/posts/export/', {'types': 'posts,likes'})
+        self.assertEqual(response.status_code, 200)
+        # A sync iterator would be read to the end before anything is sent
+        self.assertTrue(response.is_async)
+        lines = b''.join([block async for block in response.streaming_content]).decode().splitlines()
+        self.assertEqual([json.loads(line)['type'] for line in lines], ['post', 'like'])
+
+
+class CommentListTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=self.user, title='Title', content='Content')
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.user, content=f'Comment {index}') for index in range(3)
+        ])
+        self.client.force_authenticate(self.user)
+
+    def test_filter_by_post(self):
+        response = self.client.get('/api/posts/comments/', {'post_id': self.post.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_invalid_post_id(self):
+        response = self.client.get('/api/posts/comments/', {'post_id': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('post_id', response.data)
+
+
+class CommentCounterTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='member')
+        self.post = Post.objects.create(author=self.user, title='Title', content='Content')
+        self.client.force_authenticate(self.user)
+
+    def get_comments_count(self):
+        self.post.refresh_from_db()
+        return self.post.comments_count
+
+    def test_post_comment_action(self):
+        response = self.client.post(f'/api/posts/{self.post.pk}/comment/', {'content': 'Comment'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.get_comments_count(), 1)
+
+    def test_comment_viewset_create_and_destroy(self):
+        response = self.client.post('/api/posts/comments/', {'post': self.post.pk, 'content': 'Comment'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.get_comments_count(), 1)
+        self.assertEqual(self.client.delete(f'/api/posts/comments/{response.data["id"]}/').status_code, 204)
+        self.assertEqual(self.get_comments_count(), 0)
+
+    def test_rebuild_post_counters(self):
+        other = User.objects.create_user(username='other')
+        Comment.objects.create(post=self.post, author=other, content='Comment')
+        Like.objects.create(post=self.post, user=other)
+        Post.objects.filter(pk=self.post.pk).update(likes_count=7, comments_count=5)
+
+        call_command('rebuild_post_counters', stdout=io.StringIO())
+
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.post.comments_count), (1, 1))
+
+
+class HotScoreTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [User.objects.create_user(username=f'user{index}') for index in range(4)]
+        self.posts = [
+            Post.objects.create(author=self.users[0], title=f'Post {index}', content='Content')
+            for index in range(3)
+        ]
+
+    def engage(self, post, likes, comments):
+        for user in self.users[:likes]:
+            self.client.force_authenticate(user)
+            self.client.post(f'/api/posts/{post.pk}/like/')
+        for index in range(comments):
+            self.client.force_authenticate(self.users[index % len(self.users)])
+            self.client.post('/api/posts/comments/', {'post': post.pk, 'content': 'Comment'})
+
+    def test_incremental_scores_match_recompute(self):
+        self.engage(self.posts[0], likes=4, comments=3)
+        self.engage(self.posts[1], likes=1, comments=0)
+        # Unlike and delete a comment so both directions of the update run
+        self.client.force_authenticate(self.users[0])
+        self.client.post(f'/api/posts/{self.posts[0].pk}/unlike/')
+        self.client.delete(f'/api/posts/comments/{Comment.objects.filter(author=self.users[0]).first().pk}/')
+        incremental = dict(Post.objects.values_list('pk', 'hot_score'))
+
+        call_command('recompute_hot_scores', stdout=io.StringIO())
+
+        for pk, hot_score in Post.objects.values_list('pk', 'hot_score'):
+            self.assertAlmostEqual(incremental[pk], hot_score, places=6)
+
+    def test_trending(self):
+        self.engage(self.posts[2], likes=4, comments=2)
+        self.engage(self.posts[0], likes=1, comments=0)
+        self.client.force_authenticate(self.users[0])
+        response = self.client.get('/api/posts/trending/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([post['id'] for post in response.data],
+                         [self.posts[2].pk, self.posts[0].pk, self.posts[1].pk])
+        self.assertEqual(len(self.client.get('/api/posts/trending/', {'limit': 1}).data), 1)
+        response = self.client.get('/api/posts/trending/', {'limit': 'many'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('limit', response.data)
+
+
+class LikeTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='member')
+        self.post = Post.objects.create(author=self.user, title='Title', content='Content')
+        self.url = f'/api/posts/{self.post.pk}/'
+        self.client.force_authenticate(self.user)
+
+    def test_like_is_idempotent(self):
+        hot_score = self.post.hot_score
+        response = self.client.post(self.url + 'like/')
+        self.assertEqual((response.status_code, response.data), (201, {'post_id': self.post.pk, 'is_liked': True}))
+        response = self.client.post(self.url + 'like/')
+        self.assertEqual((response.status_code, response.data), (200, {'post_id': self.post.pk, 'is_liked': True}))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+        self.assertEqual(Like.objects.filter(post=self.post).count(), 1)
+        self.assertAlmostEqual(self.post.hot_score - hot_score, math.log10(2))
+
+    def test_unlike_is_idempotent(self):
+        hot_score = self.post.hot_score
+        self.client.post(self.url + 'like/')
+        self.assertEqual(self.client.post(self.url + 'unlike/').status_code, 204)
+        self.assertEqual(self.client.post(self.url + 'unlike/').status_code, 204)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+        self.assertAlmostEqual(self.post.hot_score, hot_score)
+
+    def test_unlike_never_liked(self):
+        self.assertEqual(self.client.post(self.url + 'unlike/').status_code, 204)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+
+    def test_missing_post(self):
+        self.assertEqual(self.client.post('/api/posts/999999/like/').status_code, 404)
+        self.assertEqual(self.client.post('/api/posts/999999/unlike/').status_code, 404)
+        self.assertEqual(self.client.post('/api/posts/abc/like/').status_code, 404)
+        self.assertFalse(Like.objects.exists())
+
+    def test_counter_never_goes_negative(self):
+        # Drifted counter: a like row the counter does not know about
+        Like.objects.bulk_create([Like(post=self.post, user=self.user)])
+        self.assertEqual(self.client.post(self.url + 'unlike/').status_code, 204)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+
+
+class EventTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='member')
+        self.post = Post.objects.create(author=self.user, title='Liked', content='Content')
+        self.other = Post.objects.create(author=self.user, title='Commented', content='Content')
+        self.broker = events.InProcessBroker()
+        patcher = mock.patch.object(events, '_broker', self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def like_and_comment(self):
+        # Runs in the test's sync thread, away from the subscriber's event loop
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post(f'/api/posts/{self.post.pk}/like/')
+            client.post(f'/api/posts/{self.other.pk}/comment/', {'content': 'Comment'})
+
+    async def test_events_from_sync_writes(self):
+        subscription = self.broker.subscribe()
+        await sync_to_async(self.like_and_comment)()
+
+        liked = await asyncio.wait_for(subscription.__anext__(), 1)
+        self.assertEqual((liked.type, liked.data), ('post_likes', {'post_id': self.post.pk, 'likes_count': 1}))
+        commented = await asyncio.wait_for(subscription.__anext__(), 1)
+        self.assertEqual(commented.type, 'comment_created')
+        self.assertEqual(commented.data['comment']['content'], 'Comment')
+        subscription.close()
+        self.assertFalse(self.broker.subscribers)
+
+    async def test_stream_filters_by_post(self):
+        stream = stream_events(self.broker.subscribe(), {self.other.pk})
+        self.assertEqual(await stream.__anext__(), b'retry: 3000\n\n')
+        await sync_to_async(self.like_and_comment)()
+
+        chunk = (await asyncio.wait_for(stream.__anext__(), 1)).decode()
+        self.assertIn('event: comment_created\n', chunk)
+        self.assertIn(f'"post_id":{self.other.pk}', chunk)
+        await stream.aclose()
+        self.assertFalse(self.broker.subscribers)
+
+
+class LikeSyncTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='member')
+        self.post = Post.objects.create(author=self.user, title='Title', content='Content')
+        self.client.force_authenticate(self.user)
+
+    def test_json(self):
+        response = self.client.post('/api/posts/sync_likes/', {'like': [self.post.pk], 'unlike': []}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'liked': [self.post.pk], 'unliked': []})
+
+    @unittest.skipIf(renderers.msgpack is None, 'msgpack is not installed')
+    def test_msgpack(self):
+        body = renderers.msgpack.packb({'like': [self.post.pk], 'unlike': []})
+        response = self.client.post('/api/posts/sync_likes/', body, content_type='application/msgpack')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'liked': [self.post.pk], 'unliked': []})
+
+    @unittest.skipUnless(renderers.msgpack is None, 'msgpack is installed')
+    def test_msgpack_unsupported(self):
+        response = self.client.post('/api/posts/sync_likes/', b'\x80', content_type='application/msgpack')
+        self.assertEqual(response.status_code, 415)
+
+
+@override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {
+    'like_user': '2/min', 'comment_user': '1/min', 'comment_ip': '1/min',
+}})
+class ThrottleTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='member')
+        self.post = Post.objects.create(author=self.user, title='Title', content='Content')
+        self.client.force_authenticate(self.user)
+
+    def test_like_bucket(self):
+        url = f'/api/posts/{self.post.pk}/'
+        self.assertEqual(self.client.post(url + 'like/').status_code, 201)
+        self.assertEqual(self.client.post(url + 'unlike/').status_code, 204)
+        response = self.client.post(url + 'like/')
+        self.assertEqual(response.status_code, 429)
+        # 2/min refills a token every 30 seconds
+        self.assertTrue(response['Retry-After'].isdigit())
+        self.assertTrue(0 < int(response['Retry-After']) <= 30)
+
+    def test_comment_reads_are_not_throttled(self):
+        data = {'post': self.post.pk, 'content': 'Comment'}
+        self.assertEqual(self.client.post('/api/posts/comments/', data).status_code, 201)
+        self.assertEqual(self.client.post('/api/posts/comments/', data).status_code, 429)
+        for _ in range(3):
+            self.assertEqual(self.client.get('/api/posts/comments/', {'post_id': self.post.pk}).status_code, 200)
+
+
+class TokenBucketTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.bucket = TokenBucket(capacity=2, interval=1000)
+        patcher = mock.patch('social_media.throttling.time.time', return_value=1000.0)
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def consume(self):
+        return self.bucket.consume('throttle:test')
+
+    def test_capacity_and_refill(self):
+        self.assertIsNone(self.consume())
+        self.assertIsNone(self.consume())
+        self.assertEqual(self.consume(), 1.0)
+        self.clock.return_value += 1
+        self.assertIsNone(self.consume())
+        self.assertEqual(self.consume(), 1.0)
+
+    def test_refilled_bucket_before_key_expiry(self):
+        self.consume()
+        self.consume()
+        # Full again after two seconds; the key lives a little longer
+        self.clock.return_value += 2.5
+        self.assertIsNone(self.consume())
+        self.assertIsNone(self.consume())
+        self.assertEqual(self.consume(), 1.0)
+
+
+class AdminTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='password')
+        self.client.force_login(self.admin)
+
+    def seed(self, posts, per_post, prefix):
+        users = User.objects.bulk_create([User(username=f'{prefix}{index}') for index in range(per_post)])
+        created = Post.objects.bulk_create([
+            Post(author=users[0], title=f'Gardening post {index}', content='Content') for index in range(posts)
+        ])
+        Comment.objects.bulk_create([
+            Comment(post=post, author=user, content='Comment') for post in created for user in users
+        ])
+        Like.objects.bulk_create([Like(post=post, user=user) for post in created for user in users])
+        return created
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow(self):
+        urls = ['/admin/posts/post/', '/admin/posts/comment/', '/admin/posts/like/']
+        self.seed(1, 1, 'few')
+        # The first admin page also writes the session
+        self.client.get(urls[0])
+        counts = [self.count_queries(url) for url in urls]
+        self.seed(30, 10, 'many')
+        self.assertEqual([self.count_queries(url) for url in urls], counts)
+
+    def test_inline_previews_are_capped(self):
+        post, = self.seed(1, 25, 'user')
+        response = self.client.get(f'/admin/posts/post/{post.pk}/change/')
+        self.assertEqual(response.status_code, 200)
+        for inline in response.context['inline_admin_formsets']:
+            self.assertEqual(len(inline.formset.forms), 20)
+
+    def test_search(self):
+        self.seed(2, 1, 'member')
+        # bulk_create skips the signals that index posts
+        rebuild_index()
+        def result_count(term):
+            return self.client.get('/admin/posts/post/', {'q': term}).context['cl'].result_count
+        self.assertEqual(result_count('garden'), 2)
+        self.assertEqual(result_count('member0'), 2)
+        # Substrings need the search_fields scan, used without a full-text index
+        self.assertEqual(result_count('ardenin'), 0)
+        with override_settings(POSTS_SEARCH_BACKEND='basic'):
+            self.assertEqual(result_count('ardenin'), 2)
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        for name, queryset in get_hot_queries().items():
+            with self.subTest(name):
+                plan = queryset.explain()
+                self.assertEqual(find_full_scans(plan), [], plan)
+
+
+def make_png(color='red', size=(8, 8), exif=None):
+    output = io.BytesIO()
+    Image.new('RGB', size, color).save(output, 'PNG', **({'exif': exif} if exif is not None else {}))
+    return output.getvalue()
+
+
+class UploadTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, IMAGE_PIPELINE_MODE='sync')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(username='author', password='password')
+
+    def stored_files(self):
+        return sorted(
+            os.path.relpath(os.path.join(directory, name), self.media_root)
+            for directory, _, names in os.walk(self.media_root) for name in names
+        )
+
+    def create_post(self, image):
+        self.client.force_authenticate(self.user)
+        return self.client.post('/api/posts/', {
+            'title': 'Title', 'content': 'Content', 'image': SimpleUploadedFile('image.png', image),
+        })
+
+    def test_saved_upload_is_stored_once_by_hash(self):
+        image = make_png()
+        first = self.create_post(image)
+        second = self.create_post(image)
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        stored = self.stored_files()
+        self.assertEqual(len(stored), 1)
+        self.assertTrue(stored[0].startswith('uploads/') and stored[0].endswith('.png'))
+        self.assertEqual(Post.objects.get(pk=first.data['id']).image.name, stored[0])
+
+    @override_settings(IMAGE_VARIANT_WIDTHS=[320, 1080], IMAGE_VARIANT_FORMATS=['webp', 'jpeg'])
+    def test_variants(self):
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera maker'
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.create_post(make_png(size=(400, 200), exif=exif))
+        self.assertEqual(response.status_code, 201)
+
+        post = Post.objects.get(pk=response.data['id'])
+        # Widths past the original are clamped to it
+        self.assertEqual(set(post.image_variants['webp']), {'320', '400'})
+        for width, name in post.image_variants['webp'].items():
+            with Image.open(os.path.join(self.media_root, name)) as variant:
+                self.assertEqual((variant.format, variant.width), ('WEBP', int(width)))
+                self.assertEqual(dict(variant.getexif()), {})
+
+        srcset = self.client.get(f'/api/posts/{post.pk}/').data['image_srcset']
+        self.assertEqual(set(srcset), {'webp', 'jpeg'})
+        self.assertTrue(srcset['webp']['320'].endswith(post.image_variants['webp']['320']))
+
+    def test_text_only_post_skips_variants_update(self):
+        self.client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/posts/', {'title': 'Title', 'content': 'Content'})
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE')])
+        self.assertEqual(Post.objects.get(pk=response.data['id']).image_variants, {})
+
+    def test_rejected_post_leaves_no_file(self):
+        response = self.create_post(b'\x89PNG\r\n\x1a\n' + b'not an image' * 10)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.stored_files(), [])
+
+    def test_anonymous_upload_leaves_no_file(self):
+        response = self.client.post('/api/users/login/', {
+            'username': 'author', 'password': 'wrong', 'image': SimpleUploadedFile('image.png', make_png()),
+        })
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.stored_files(), [])
@@ -0,0 +1,111 @@
+"""
+Materialized home timelines.
+
+New posts are fanned out into a TimelineEntry row per follower at write time,
+so reading a feed is a range read on (owner, created_at, post). Authors with
+more than TIMELINE_FANOUT_MAX_FOLLOWERS followers are skipped on write and
+their posts are merged in when the feed is read instead.
+"""
+from django.conf import settings
+from django.db.models import F
+
+from social_media.users.models import Follow, Profile
+from .models import Post, TimelineEntry
+
+
+def get_fanout_limit():
+    return getattr(settings, 'TIMELINE_FANOUT_MAX_FOLLOWERS', 10000)
+
+
+def is_fanout_author(user_id):
+    """
+    Return True if posts by this user are pushed to followers on write.
+    """
+    followers_count = Profile.objects.filter(user_id=user_id).values_list(
+        'followers_count', flat=True
+    ).first()
+    return (followers_count or 0) <= get_fanout_limit()
+
+
+def fan_out_post(post):
+    if not is_fanout_author(post.author_id):
+        return 0
+    follower_ids = Follow.objects.filter(followee_id=post.author_id).values_list('follower_id', flat=True)
+    entries = [
+        TimelineEntry(owner_id=follower_id, post=post, created_at=post.created_at)
+        for follower_id in follower_ids.iterator()
+    ]
+    TimelineEntry.objects.bulk_create(entries, batch_size=1000, ignore_conflicts=True)
+    return len(entries)
+
+
+def backfill_timeline(follower_id, followee_id):
+    """
+    Copy the most recent posts of a newly followed user into the follower's
+    timeline so the feed is not empty until they post again.
+    """
+    if not is_fanout_author(followee_id):
+        return 0
+    backfill_size = getattr(settings, 'TIMELINE_BACKFILL_SIZE', 200)
+    posts = Post.objects.filter(author_id=followee_id).order_by('-created_at', '-id').values_list(
+        'id', 'created_at'
+    )[:backfill_size]
+    entries = [
+        TimelineEntry(owner_id=follower_id, post_id=post_id, created_at=created_at)
+        for post_id, created_at in posts
+    ]
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+    return len(entries)
+
+
+def purge_timeline(follower_id, followee_id):
+    TimelineEntry.objects.filter(owner_id=follower_id, post__author_id=followee_id).delete()
+
+
+def get_merged_authors(user):
+    # Posts by accounts above the fan-out limit were never materialized
+    return Follow.objects.filter(
+        follower=user, followee__profile__followers_count__gt=get_fanout_limit()
+    ).values_list('followee_id', flat=True)
+
+
+def build_feed_sources(user, merged_author_ids):
+    sources = [TimelineEntry.objects.filter(owner=user).values('created_at', 'post_id')]
+    if merged_author_ids:
+        sources.append(
+            Post.objects.filter(author_id__in=merged_author_ids)
+            .annotate(post_id=F('id'))
+            .values('created_at', 'post_id')
+        )
+    return sources
+
+
+def get_feed_sources(user):
+    """
+    Return the querysets a user's home feed is merged from, as
+    (created_at, post_id) rows, or None if the user follows nobody yet.
+    """
+    if not Follow.objects.filter(follower=user).exists():
+        return None
+    return build_feed_sources(user, list(get_merged_authors(user)))
+
+
+async def aget_feed_sources(user):
+    if not await Follow.objects.filter(follower=user).aexists():
+        return None
+    return build_feed_sources(user, [author_id async for author_id in get_merged_authors(user).aiterator()])
+
+
+def order_timeline_posts(posts, rows):
+    return [posts[row['post_id']] for row in rows if row['post_id'] in posts]
+
+
+def load_timeline_posts(queryset, rows):
+    """
+    Fetch the posts for a page of timeline rows, keeping the row order.
+    """
+    return order_timeline_posts(queryset.in_bulk([row['post_id'] for row in rows]), rows)
+
+
+async def aload_timeline_posts(queryset, rows):
+    return order_timeline_posts(await queryset.ain_bulk([row['post_id'] for row in rows]), rows)
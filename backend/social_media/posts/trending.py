@@ -0,0 +1,69 @@
+"""
+Hot scores behind /api/posts/trending/.
+
+    hot_score = log10(1 + likes + POSTS_TRENDING_COMMENT_WEIGHT * comments)
+                + (created_at - EPOCH) / POSTS_TRENDING_DECAY_SECONDS
+
+The time term makes newer posts start higher, so stored scores never have to
+be decayed: a post needs ten times the engagement to rank level with one
+posted POSTS_TRENDING_DECAY_SECONDS later. Writes that change a post's
+counters change hot_score by the difference in the log term within the same
+UPDATE, and the recompute_hot_scores command rebuilds scores in bulk from the
+counters.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import F, Value
+from django.db.models.functions import Log
+from django.utils import timezone
+
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def get_comment_weight():
+    # An integer, so the raw SQL form stays valid for PostgreSQL's log(numeric, numeric)
+    return int(getattr(settings, 'POSTS_TRENDING_COMMENT_WEIGHT', 2))
+
+
+def get_time_score(created_at):
+    return (created_at - EPOCH).total_seconds() / getattr(settings, 'POSTS_TRENDING_DECAY_SECONDS', 45000)
+
+
+def get_initial_hot_score():
+    # Post.hot_score default: a post with no likes or comments created now
+    return get_time_score(timezone.now())
+
+
+def engagement_score(likes, comments):
+    return Log(10, likes + comments * get_comment_weight() + 1)
+
+
+def hot_score_expression(created_at):
+    """
+    The full hot_score for a post created at ``created_at``, from its
+    counters at the time the UPDATE runs.
+    """
+    return Value(get_time_score(created_at)) + engagement_score(F('likes_count'), F('comments_count'))
+
+
+def hot_score_change(likes=0, comments=0):
+    """
+    New hot_score for an UPDATE that also moves the counters by ``likes`` and
+    ``comments``. F() reads the counters as they were before the UPDATE.
+    """
+    before = engagement_score(F('likes_count'), F('comments_count'))
+    after = engagement_score(F('likes_count') + likes, F('comments_count') + comments)
+    return F('hot_score') + after - before
+
+
+def get_likes_change_sql(change):
+    """
+    hot_score_change(likes=change) as raw SQL and params, for likes.py.
+    """
+    weight = get_comment_weight()
+    return (
+        'hot_score + LOG(10, likes_count + %s + %s * comments_count + 1) '
+        '- LOG(10, likes_count + %s * comments_count + 1)',
+        [change, weight, weight],
+    )
@@ -10,6 +10,7 @@ comments_router = DefaultRouter()
 comments_router.register(r'', CommentViewSet, basename='comments')
 
 urlpatterns = [
-    path('', include(router.urls)),
+    # Must come first, otherwise the post detail route swallows 'comments/'
     path('comments/', include(comments_router.urls)),
+    path('', include(router.urls)),
 ] 
\ No newline at end of file
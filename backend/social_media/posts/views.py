@@ -1,10 +1,26 @@
 from rest_framework import viewsets, permissions, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q
-from django.shortcuts import get_object_or_404
-from .models import Post, Comment, Like
-from .serializers import PostSerializer, CommentSerializer, LikeSerializer
+from django.conf import settings
+from django.db import router, transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.db.models import Q, F
+from .models import Post, Comment
+from social_media.db import ReplicaReadMixin
+from social_media.images import schedule_variants
+from social_media.throttling import WRITE_THROTTLES
+from social_media.renderers import DATA_PARSER_CLASSES
+from .serializers import PostSerializer, CompactPostSerializer, CommentSerializer, LikeSyncSerializer
+from .pagination import FeedPagination, HomeTimelinePagination, CommentPagination, SearchPagination
+from .timelines import get_feed_sources, load_timeline_posts
+from .search import PostSearchFilter
+from .cache import CachedPostResponseMixin
+from .likes import like_posts, unlike_posts
+from .trending import hot_score_change
+from .export import EXPORT_TYPES, iter_ndjson, gzip_blocks, aiter_blocks, parse_updated_since
+from .events import publish
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.parsers import MultiPartParser, FormParser
 
 class IsAuthorOrReadOnly(permissions.BasePermission):
@@ -18,24 +34,68 @@ class IsAuthorOrReadOnly(permissions.BasePermission):
         # Write permissions are only allowed to the author
         return obj.author == request.user
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(ReplicaReadMixin, CachedPostResponseMixin, viewsets.ModelViewSet):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
     parser_classes = [MultiPartParser, FormParser]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['title', 'content']
+    filter_backends = [PostSearchFilter, filters.OrderingFilter]
     ordering_fields = ['created_at', 'updated_at']
+    # Set per action; see social_media/throttling.py
+    throttle_scope = None
+    
+    @property
+    def paginator(self):
+        # Only ranked search results are paginated; the plain list keeps its shape
+        if not hasattr(self, '_paginator'):
+            searching = self.action == 'list' and PostSearchFilter().get_search_term(self.request)
+            self._paginator = SearchPagination() if searching else None
+        return self._paginator
     
     def get_queryset(self):
         # Return all posts - we'll handle permissions in has_object_permission
-        return Post.objects.all()
+        if self.action == 'comment':
+            # This action never serializes the post itself
+            return Post.objects.all()
+        if self.get_post_shape() == 'compact':
+            return Post.objects.with_details(comment_limit=settings.POSTS_COMMENTS_PREVIEW_SIZE)
+        return Post.objects.with_details()
+    
+    def perform_create(self, serializer):
+        post = serializer.save()
+        # Resized variants are generated in the background after the response
+        schedule_variants(post, 'image', 'image_variants')
+        publish('post_created', {
+            'post_id': post.pk, 'author_id': post.author_id, 'created_at': post.created_at.isoformat(),
+        })
+    
+    def perform_update(self, serializer):
+        if 'image' not in serializer.validated_data:
+            serializer.save()
+            return
+        post = serializer.save(image_variants={})
+        schedule_variants(post, 'image', 'image_variants')
+    
+    def get_post_shape(self):
+        """
+        'full' embeds every comment, 'compact' only the newest few. Clients pick
+        with ?shape=; list endpoints default to compact.
+        """
+        shape = self.request.query_params.get('shape')
+        if shape in ['full', 'compact']:
+            return shape
+        return 'compact' if self.action in ['list', 'feed', 'my_posts', 'trending'] else 'full'
+    
+    def get_serializer_class(self):
+        if self.get_post_shape() == 'compact':
+            return CompactPostSerializer
+        return PostSerializer
     
     @action(detail=False, methods=['get'])
     def my_posts(self, request):
         if not request.user.is_authenticated:
             return Response({'detail': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
-        posts = Post.objects.filter(author=request.user)
+        posts = self.get_queryset().filter(author=request.user)
         serializer = self.get_serializer(posts, many=True)
         return Response(serializer.data)
     
@@ -43,44 +103,106 @@ class PostViewSet(viewsets.ModelViewSet):
     def feed(self, request):
         if not request.user.is_authenticated:
             return Response({'detail': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
-        # In a more complex system, this would show posts from followed users
-        # For now, show all posts (except your own)
-        posts = Post.objects.exclude(author=request.user)
+        sources = get_feed_sources(request.user)
+        if sources is None:
+            # Not following anyone yet: show all posts (except your own)
+            posts = self.get_queryset().exclude(author=request.user)
+            paginator = FeedPagination()
+            page = paginator.paginate_queryset(posts, request, view=self)
+        else:
+            # Materialized timeline merged with posts by high-follower accounts
+            paginator = HomeTimelinePagination()
+            rows = paginator.paginate_querysets(sources, request, view=self)
+            page = load_timeline_posts(self.get_queryset(), rows)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """
+        The top ``?limit=`` posts by stored hot score.
+        """
+        try:
+            limit = int(request.query_params.get('limit', settings.POSTS_TRENDING_SIZE))
+        except ValueError:
+            raise ValidationError({'limit': ['A valid integer is required.']})
+        limit = max(1, min(limit, settings.POSTS_TRENDING_MAX_SIZE))
+        posts = self.get_queryset().order_by('-hot_score', '-id')[:limit]
         serializer = self.get_serializer(posts, many=True)
         return Response(serializer.data)
     
-    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
-    def like(self, request, pk=None):
-        post = self.get_object()
-        user = request.user
-        
-        # Debug authentication
-        if not request.user.is_authenticated:
-            return Response({'detail': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def export(self, request):
+        """
+        Stream posts, comments and likes as NDJSON (see export.py).
+        ``?updated_since=`` exports only newer rows, ``?types=posts,likes``
+        picks tables and ``?gzip=1`` compresses the stream.
+        """
+        updated_since = request.query_params.get('updated_since')
+        if updated_since:
+            try:
+                updated_since = parse_updated_since(updated_since)
+            except ValueError as exc:
+                raise ValidationError({'updated_since': [str(exc)]})
+        types = request.query_params.get('types')
+        types = types.split(',') if types else list(EXPORT_TYPES)
+        if not set(types) <= set(EXPORT_TYPES):
+            raise ValidationError({'types': [f'Choose from {", ".join(EXPORT_TYPES)}.']})
         
-        # Check if user already liked the post
-        if Like.objects.filter(post=post, user=user).exists():
-            return Response({'detail': 'You already liked this post'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Create a new like
-        like = Like.objects.create(post=post, user=user)
-        serializer = LikeSerializer(like)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        # The stream is read after dispatch returns, outside read_from_replica
+        blocks = iter_ndjson(types, updated_since or None, using=router.db_for_read(Post))
+        if request.query_params.get('gzip') in ('1', 'true'):
+            blocks = gzip_blocks(blocks)
+            content_type, filename = 'application/gzip', 'export.ndjson.gz'
+        else:
+            content_type, filename = 'application/x-ndjson', 'export.ndjson'
+        if isinstance(request._request, ASGIRequest):
+            # Django would read a sync iterator to the end before sending it
+            blocks = aiter_blocks(blocks)
+        response = StreamingHttpResponse(blocks, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    
+    def get_post_id(self):
+        try:
+            return int(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        except ValueError:
+            raise NotFound()
+    
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated],
+            throttle_classes=WRITE_THROTTLES, throttle_scope='like')
+    def like(self, request, pk=None):
+        # Idempotent: liking twice is not an error and counts once
+        post_id = self.get_post_id()
+        if like_posts(request.user, [post_id]):
+            return Response({'post_id': post_id, 'is_liked': True}, status=status.HTTP_201_CREATED)
+        if not Post.objects.filter(pk=post_id).exists():
+            raise NotFound()
+        return Response({'post_id': post_id, 'is_liked': True})
     
-    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated],
+            throttle_classes=WRITE_THROTTLES, throttle_scope='like')
     def unlike(self, request, pk=None):
-        post = self.get_object()
-        user = request.user
-        
-        # Debug authentication
-        if not request.user.is_authenticated:
-            return Response({'detail': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
-        
-        like = get_object_or_404(Like, post=post, user=user)
-        like.delete()
+        post_id = self.get_post_id()
+        if not unlike_posts(request.user, [post_id]) and not Post.objects.filter(pk=post_id).exists():
+            raise NotFound()
         return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated],
+            parser_classes=DATA_PARSER_CLASSES, throttle_classes=WRITE_THROTTLES, throttle_scope='like')
+    def sync_likes(self, request):
+        """
+        Apply a batch of likes and unlikes, e.g. queued while offline.
+        Returns the posts whose like state changed; missing posts are ignored.
+        """
+        serializer = LikeSyncSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        liked = like_posts(request.user, serializer.validated_data['like'])
+        unliked = unlike_posts(request.user, serializer.validated_data['unlike'])
+        return Response({'liked': sorted(liked), 'unliked': sorted(unliked)})
         
-    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated], parser_classes=[MultiPartParser, FormParser])
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated], parser_classes=[MultiPartParser, FormParser],
+            throttle_classes=WRITE_THROTTLES, throttle_scope='comment')
     def comment(self, request, pk=None):
         post = self.get_object()
         user = request.user
@@ -99,29 +221,57 @@ class PostViewSet(viewsets.ModelViewSet):
         if not content:
             return Response({'detail': 'Comment content is required'}, status=status.HTTP_400_BAD_REQUEST)
             
-        comment = Comment.objects.create(
-            post=post,
-            author=user,
-            content=content
-        )
+        with transaction.atomic():
+            comment = Comment.objects.create(
+                post=post,
+                author=user,
+                content=content
+            )
+            Post.objects.filter(pk=post.pk).update(
+                comments_count=F('comments_count') + 1, hot_score=hot_score_change(comments=1)
+            )
         
         serializer = CommentSerializer(comment, context={'request': request})
+        publish('comment_created', {'post_id': post.pk, 'comment': serializer.data})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 class CommentViewSet(viewsets.ModelViewSet):
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticated, IsAuthorOrReadOnly]
+    pagination_class = CommentPagination
+    throttle_scope = 'comment'
+    
+    def get_throttles(self):
+        # Same budget as PostViewSet.comment; reads are not throttled
+        if self.action == 'create':
+            return [throttle() for throttle in WRITE_THROTTLES]
+        return super().get_throttles()
     
     def get_queryset(self):
         # Filter comments by post if post_id is provided in query params
+        comments = Comment.objects.select_related('author__profile')
         post_id = self.request.query_params.get('post_id', None)
         if post_id:
-            return Comment.objects.filter(post_id=post_id)
-        return Comment.objects.all()
+            if not post_id.isdigit():
+                raise ValidationError({'post_id': ['A valid integer is required.']})
+            return comments.filter(post_id=post_id)
+        return comments
         
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save(author=request.user)
-        return Response(serializer.data, status=status.HTTP_201_CREATED) 
\ No newline at end of file
+        with transaction.atomic():
+            comment = serializer.save(author=request.user)
+            Post.objects.filter(pk=comment.post_id).update(
+                comments_count=F('comments_count') + 1, hot_score=hot_score_change(comments=1)
+            )
+        publish('comment_created', {'post_id': comment.post_id, 'comment': serializer.data})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            Post.objects.filter(pk=instance.post_id, comments_count__gt=0).update(
+                comments_count=F('comments_count') - 1, hot_score=hot_score_change(comments=-1)
+            ) 
\ No newline at end of file
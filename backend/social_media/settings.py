@@ -3,6 +3,8 @@ Django settings for social_media project.
 """
 
 import os
+import sys
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -33,11 +35,15 @@ INSTALLED_APPS = [
     'rest_framework.authtoken',
     'corsheaders',
     # Local apps
+    'social_media.apps.SocialMediaConfig',
     'social_media.users',
     'social_media.posts',
 ]
 
 MIDDLEWARE = [
+    # Outermost, so the request id and timings cover the other middleware too
+    'social_media.log.RequestLogMiddleware',
+    'social_media.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -71,10 +77,69 @@ WSGI_APPLICATION = 'social_media.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
+# DB_ENGINE is 'sqlite' (default) or 'postgresql' (needs psycopg2 or psycopg).
+# Connections are kept open for DB_CONN_MAX_AGE seconds, so each worker
+# thread reuses one connection and the pool size is the number of worker
+# threads; put PgBouncer in front of PostgreSQL to share connections between
+# processes (set DB_PGBOUNCER=1 when it runs in transaction pooling mode).
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'social_media'),
+            'USER': os.environ.get('DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_PGBOUNCER') == '1',
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+        }
+    }
+
+DATABASES['default'].update({
+    'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+    'CONN_HEALTH_CHECKS': True,
+})
+
+# PostgreSQL read replica for PostViewSet GET requests (social_media/db.py). Only
+# the host differs from the primary; tests mirror it to the primary.
+if os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['DB_REPLICA_HOST'],
+        'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default'].get('PORT', '')),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['social_media.db.ReplicaRouter']
+
+# Applied to every new SQLite connection: WAL lets readers run alongside the
+# single writer, NORMAL sync is safe under WAL, and writers wait up to
+# busy_timeout ms for the write lock instead of failing with "database is locked"
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+}
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# locmem is per process; point CACHE_BACKEND at a shared backend (e.g. Redis
+# or Memcached) when running several workers
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'social-media'),
     }
 }
 
@@ -120,6 +185,30 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploads are streamed to MEDIA_ROOT, checked for image magic bytes and a
+# size budget as they arrive, and stored once per content hash
+# (see social_media/uploads.py)
+FILE_UPLOAD_HANDLERS = ['social_media.uploads.StreamingImageUploadHandler']
+UPLOAD_MAX_IMAGE_BYTES = int(os.environ.get('UPLOAD_MAX_IMAGE_BYTES', 10 * 1024 * 1024))
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'social_media.uploads.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Background image pipeline (social_media/images.py): resized, EXIF-free
+# variants of uploaded pictures. IMAGE_PIPELINE_MODE is 'thread' (worker
+# pool, default) or 'sync' (process after commit in the request thread)
+IMAGE_PIPELINE_MODE = os.environ.get('IMAGE_PIPELINE_MODE', 'thread')
+IMAGE_PIPELINE_WORKERS = int(os.environ.get('IMAGE_PIPELINE_WORKERS', 2))
+IMAGE_VARIANT_WIDTHS = [320, 640, 1080]
+IMAGE_VARIANT_FORMATS = ['webp', 'jpeg']
+IMAGE_VARIANT_QUALITY = 80
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -128,14 +217,144 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        os.environ.get('API_TOKEN_AUTHENTICATION', 'social_media.users.authentication.CachedTokenAuthentication'),
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # orjson-backed JSON (social_media/renderers.py). The MessagePack classes
+    # are only registered when the optional msgpack package is installed;
+    # without it application/msgpack gets 406 or 415 like any unknown type
+    'DEFAULT_RENDERER_CLASSES': [
+        'social_media.renderers.ORJSONRenderer',
+        *(['social_media.renderers.MessagePackRenderer'] if find_spec('msgpack') else []),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'social_media.renderers.ORJSONParser',
+        *(['social_media.renderers.MessagePackParser'] if find_spec('msgpack') else []),
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # Token buckets for the write endpoints (social_media/throttling.py):
+    # '<size>/<period>' refills the whole bucket once per period
+    'DEFAULT_THROTTLE_RATES': {
+        'like_user': os.environ.get('THROTTLE_RATE_LIKE_USER', '120/min'),
+        'like_ip': os.environ.get('THROTTLE_RATE_LIKE_IP', '600/min'),
+        'comment_user': os.environ.get('THROTTLE_RATE_COMMENT_USER', '20/min'),
+        'comment_ip': os.environ.get('THROTTLE_RATE_COMMENT_IP', '100/min'),
+        'login_username': os.environ.get('THROTTLE_RATE_LOGIN_USERNAME', '10/min'),
+        'login_ip': os.environ.get('THROTTLE_RATE_LOGIN_IP', '30/min'),
+    },
 }
 
+# Throttle buckets live in this cache, so it must be shared between workers
+THROTTLE_CACHE_ALIAS = 'default'
+
+# Token lookups cached per process by CachedTokenAuthentication; set
+# API_TOKEN_AUTHENTICATION=rest_framework.authentication.TokenAuthentication
+# to query the database on every request instead
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', 10000))
+AUTH_TOKEN_CACHE_TTL = int(os.environ.get('AUTH_TOKEN_CACHE_TTL', 60))
+# Seconds between batched Profile.last_seen writes
+LAST_SEEN_FLUSH_INTERVAL = int(os.environ.get('LAST_SEEN_FLUSH_INTERVAL', 60))
+
+# Feed pagination (keyset cursor on created_at, id)
+POSTS_FEED_PAGE_SIZE = int(os.environ.get('POSTS_FEED_PAGE_SIZE', 20))
+POSTS_FEED_MAX_PAGE_SIZE = int(os.environ.get('POSTS_FEED_MAX_PAGE_SIZE', 100))
+
+# Comments: newest N embedded in compact post payloads, the rest paged
+# through /api/posts/comments/?post_id=
+POSTS_COMMENTS_PREVIEW_SIZE = int(os.environ.get('POSTS_COMMENTS_PREVIEW_SIZE', 3))
+POSTS_COMMENTS_PAGE_SIZE = int(os.environ.get('POSTS_COMMENTS_PAGE_SIZE', 50))
+POSTS_COMMENTS_MAX_PAGE_SIZE = int(os.environ.get('POSTS_COMMENTS_MAX_PAGE_SIZE', 200))
+
+# Most post ids accepted per list by /api/posts/sync_likes/
+POSTS_LIKE_SYNC_MAX_IDS = int(os.environ.get('POSTS_LIKE_SYNC_MAX_IDS', 500))
+
+# Cached post list/detail responses (see posts/cache.py)
+POSTS_CACHE_ALIAS = 'default'
+POSTS_CACHE_TIMEOUT = int(os.environ.get('POSTS_CACHE_TIMEOUT', 300))
+
+# Delta events streamed by /api/async/posts/events/ (see posts/events.py).
+# The in-process broker only reaches clients connected to the same process
+POSTS_EVENTS_BROKER = os.environ.get('POSTS_EVENTS_BROKER', 'social_media.posts.events.InProcessBroker')
+# Recent events kept for clients resuming with Last-Event-ID
+POSTS_EVENTS_BACKLOG = int(os.environ.get('POSTS_EVENTS_BACKLOG', 1000))
+# Undelivered events per client before it is told to resync
+POSTS_EVENTS_QUEUE_SIZE = int(os.environ.get('POSTS_EVENTS_QUEUE_SIZE', 100))
+POSTS_EVENTS_KEEPALIVE = int(os.environ.get('POSTS_EVENTS_KEEPALIVE', 15))
+POSTS_EVENTS_MAX_STREAM_SECONDS = int(os.environ.get('POSTS_EVENTS_MAX_STREAM_SECONDS', 300))
+
+# /api/posts/trending/ (see posts/trending.py): a post needs ten times the
+# engagement to rank level with one posted DECAY_SECONDS later. Changing the
+# weight or decay needs a recompute_hot_scores run
+POSTS_TRENDING_SIZE = int(os.environ.get('POSTS_TRENDING_SIZE', 20))
+POSTS_TRENDING_MAX_SIZE = int(os.environ.get('POSTS_TRENDING_MAX_SIZE', 100))
+POSTS_TRENDING_COMMENT_WEIGHT = int(os.environ.get('POSTS_TRENDING_COMMENT_WEIGHT', 2))
+POSTS_TRENDING_DECAY_SECONDS = int(os.environ.get('POSTS_TRENDING_DECAY_SECONDS', 45000))
+
+# Full-text search on ?search=: 'auto' picks FTS5 on SQLite and a tsvector
+# GIN index on PostgreSQL; 'basic' falls back to icontains scans
+POSTS_SEARCH_BACKEND = os.environ.get('POSTS_SEARCH_BACKEND', 'auto')
+POSTS_SEARCH_PAGE_SIZE = int(os.environ.get('POSTS_SEARCH_PAGE_SIZE', 20))
+POSTS_SEARCH_MAX_PAGE_SIZE = int(os.environ.get('POSTS_SEARCH_MAX_PAGE_SIZE', 100))
+
+# Home timelines: posts by authors with more followers than this are merged
+# at read time instead of being fanned out to every follower on write
+TIMELINE_FANOUT_MAX_FOLLOWERS = int(os.environ.get('TIMELINE_FANOUT_MAX_FOLLOWERS', 10000))
+# Number of recent posts copied into a timeline when following someone
+TIMELINE_BACKFILL_SIZE = int(os.environ.get('TIMELINE_BACKFILL_SIZE', 200))
+
+# Logging: JSON lines on stderr, written by a background thread
+# (social_media/log.py). LOG_LEVEL applies to the project's loggers;
+# set AUTH_LOG_LEVEL=DEBUG for login diagnostics and REQUEST_LOG_LEVEL=INFO
+# for one access line per request.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+# manage.py test leaves out the warnings Django logs for expected 4xx responses
+TESTING = sys.argv[1:2] == ['test']
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'queue': {
+            '()': 'social_media.log.QueuedHandler',
+        },
+    },
+    'root': {
+        'handlers': ['queue'],
+        'level': 'WARNING',
+    },
+    'loggers': {
+        'django': {
+            'level': os.environ.get('DJANGO_LOG_LEVEL', 'INFO'),
+        },
+        'django.request': {
+            'level': 'ERROR' if TESTING else os.environ.get('DJANGO_LOG_LEVEL', 'INFO'),
+        },
+        'social_media': {
+            'level': LOG_LEVEL,
+        },
+        'social_media.requests': {
+            'level': os.environ.get('REQUEST_LOG_LEVEL', 'WARNING'),
+        },
+        'social_media.users': {
+            'level': os.environ.get('AUTH_LOG_LEVEL', LOG_LEVEL),
+        },
+    },
+}
+
+# Per-request query/latency metrics (social_media/metrics.py): Server-Timing
+# headers, a Prometheus endpoint at /metrics/ for REQUEST_METRICS_ALLOWED_IPS,
+# and a warning log with the slowest SQL for requests over the thresholds
+REQUEST_METRICS_ENABLED = os.environ.get('REQUEST_METRICS_ENABLED', '0') == '1'
+REQUEST_METRICS_SLOW_MS = int(os.environ.get('REQUEST_METRICS_SLOW_MS', 500))
+REQUEST_METRICS_MAX_QUERIES = int(os.environ.get('REQUEST_METRICS_MAX_QUERIES', 50))
+REQUEST_METRICS_SLOW_SQL_COUNT = 3
+REQUEST_METRICS_ALLOWED_IPS = os.environ.get('REQUEST_METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = DEBUG  # Allow all origins in development
 CORS_ALLOWED_ORIGINS = [
@@ -0,0 +1,155 @@
+"""
+Token-bucket throttles for the write endpoints.
+
+A view opts in with ``throttle_scope`` (e.g. ``@action(throttle_scope='like')``)
+and a throttle class per identity. The bucket size and refill come from
+DEFAULT_THROTTLE_RATES under ``<scope>_user``, ``<scope>_ip`` or
+``<scope>_username``: ``'30/min'`` is a bucket of 30 tokens refilled at one
+every two seconds. Scopes without a rate are not throttled.
+
+DRF checks throttles before the view runs, so a rejected request returns 429
+with Retry-After before any query or password hashing.
+"""
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def get_cache():
+    return caches[getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')]
+
+
+def parse_rate(rate):
+    """
+    ``'30/min'`` -> (30, 60); same format as DRF's rate throttles.
+    """
+    num_requests, period = rate.split('/')
+    return int(num_requests), PERIODS[period[0]]
+
+
+class TokenBucket:
+    """
+    A bucket of ``capacity`` tokens that refills one token every
+    ``interval`` milliseconds.
+
+    The state is a single integer per key: the time (ms) at which the bucket
+    is full again. Taking a token is one atomic cache.incr by ``interval``, so
+    concurrent requests never share a token; a rejected request gives its
+    token back with decr. The key expires once the bucket is full, which
+    resets idle buckets without a read-modify-write.
+    """
+    def __init__(self, capacity, interval):
+        self.capacity = capacity
+        self.interval = interval
+
+    def consume(self, key):
+        """
+        Take a token. Return None if one was available, otherwise the
+        seconds until one is.
+        """
+        cache = get_cache()
+        now = int(time.time() * 1000)
+        try:
+            full_at = cache.incr(key, self.interval)
+        except ValueError:
+            if cache.add(key, now + self.interval, self.get_timeout(self.interval)):
+                return None
+            full_at = cache.incr(key, self.interval)
+
+        previous = full_at - self.interval
+        if previous < now:
+            # Refilled since the last request but the key has not expired yet:
+            # move it up to now. An incr rather than a set, so tokens taken by
+            # concurrent requests are never overwritten; requests racing here
+            # each add their own gap, which at worst charges the key's expiry
+            # slack (under two seconds) once more.
+            try:
+                full_at = cache.incr(key, now - previous)
+            except ValueError:
+                # Expired in between: the bucket is full
+                return None
+        else:
+            # A full bucket holds ``capacity`` tokens, one interval apart
+            burst = self.interval * (self.capacity - 1)
+            if previous - now > burst:
+                cache.decr(key, self.interval)
+                return (previous - now - burst) / 1000
+        cache.touch(key, self.get_timeout(full_at - now))
+        return None
+
+    def get_timeout(self, milliseconds):
+        # Cache timeouts are whole seconds on some backends
+        return math.ceil(milliseconds / 1000) + 1
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle ``view.throttle_scope`` per identity; subclasses pick the
+    identity and the rate suffix.
+    """
+    suffix = None
+
+    def __init__(self):
+        self.retry_after = None
+
+    def get_identity(self, request, view):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope is None:
+            return True
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(f'{scope}_{self.suffix}')
+        if rate is None:
+            return True
+        identity = self.get_identity(request, view)
+        if identity is None:
+            return True
+
+        num_requests, duration = parse_rate(rate)
+        bucket = TokenBucket(num_requests, max(1, duration * 1000 // num_requests))
+        # Hashed: usernames and proxy headers are not safe cache key material
+        key = f'throttle:{scope}_{self.suffix}:' + hashlib.sha1(str(identity).encode()).hexdigest()
+        self.retry_after = bucket.consume(key)
+        return self.retry_after is None
+
+    def wait(self):
+        return self.retry_after
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    suffix = 'user'
+
+    def get_identity(self, request, view):
+        return request.user.pk if request.user.is_authenticated else None
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    suffix = 'ip'
+
+    def get_identity(self, request, view):
+        # REMOTE_ADDR, or X-Forwarded-For behind NUM_PROXIES proxies
+        return self.get_ident(request)
+
+
+class UsernameTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Per submitted username, to slow down password guessing against one
+    account from many addresses.
+    """
+    suffix = 'username'
+
+    def get_identity(self, request, view):
+        username = request.data.get('username')
+        return username.lower() if isinstance(username, str) and username else None
+
+
+WRITE_THROTTLES = [UserTokenBucketThrottle, IPTokenBucketThrottle]
+LOGIN_THROTTLES = [UsernameTokenBucketThrottle, IPTokenBucketThrottle]
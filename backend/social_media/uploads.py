@@ -0,0 +1,164 @@
+"""
+Streaming, content-addressed image uploads.
+
+StreamingImageUploadHandler writes each uploaded file chunk by chunk into
+MEDIA_ROOT/uploads/tmp while hashing it. It rejects a file as soon as its
+first bytes are not a known image signature or it goes over
+UPLOAD_MAX_IMAGE_BYTES. Nothing is kept until a model saves the upload:
+ContentAddressedStorage then moves the temporary file to its SHA-256 name,
+or reuses an identical image already stored there, instead of writing a
+second copy. Temporary files are deleted when the request closes its
+uploads, so rejected requests leave nothing behind.
+"""
+import hashlib
+import os
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousOperation
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+# Leading bytes of the image formats we accept, and the extension to store
+IMAGE_SIGNATURES = [
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+]
+SIGNATURE_LENGTH = 12
+# Slack for multipart boundaries, headers and the other form fields
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadRejected(APIException, SuspiciousOperation):
+    # Also a SuspiciousOperation so non-DRF views (the admin) answer 400
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = 'Only JPEG, PNG, GIF and WebP images can be uploaded.'
+    default_code = 'unsupported_upload'
+
+
+class UploadTooLarge(UploadRejected):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Uploaded file is too large.'
+    default_code = 'upload_too_large'
+
+
+def get_max_upload_bytes():
+    return getattr(settings, 'UPLOAD_MAX_IMAGE_BYTES', 10 * 1024 * 1024)
+
+
+def sniff_image_type(header):
+    for signature, extension in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return extension
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+class StoredUploadedFile(UploadedFile):
+    """
+    A hashed upload in uploads/tmp, stored at ``stored_name`` once saved.
+    """
+    def __init__(self, path, stored_name, content_hash, name, content_type, size, charset,
+                 content_type_extra=None):
+        super().__init__(open(path, 'rb'), name, content_type, size, charset, content_type_extra)
+        self.path = path
+        self.stored_name = stored_name
+        self.content_hash = content_hash
+
+    def temporary_file_path(self):
+        return self.path
+
+    def close(self):
+        try:
+            return super().close()
+        finally:
+            # Already gone if ContentAddressedStorage moved it into place
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+
+class StreamingImageUploadHandler(FileUploadHandler):
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # Refuse obviously oversized bodies before reading any of them
+        if content_length > get_max_upload_bytes() + MULTIPART_OVERHEAD:
+            raise UploadTooLarge()
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.header = b''
+        self.extension = None
+        self.received = 0
+        self.hasher = hashlib.sha256()
+        temp_dir = default_storage.path('uploads/tmp')
+        os.makedirs(temp_dir, exist_ok=True)
+        self.temp_path = os.path.join(temp_dir, uuid.uuid4().hex)
+        self.file = open(self.temp_path, 'wb')
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > get_max_upload_bytes():
+            self.discard()
+            raise UploadTooLarge()
+
+        if self.extension is None and len(self.header) < SIGNATURE_LENGTH:
+            self.header += raw_data[:SIGNATURE_LENGTH - len(self.header)]
+            if len(self.header) >= SIGNATURE_LENGTH:
+                self.check_signature()
+
+        self.hasher.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        self.file.close()
+        if self.extension is None:
+            # Files shorter than the signature window
+            self.check_signature()
+
+        content_hash = self.hasher.hexdigest()
+        stored_name = f'uploads/{content_hash[:2]}/{content_hash}.{self.extension}'
+        return StoredUploadedFile(
+            self.temp_path, stored_name, content_hash, self.file_name, self.content_type, file_size,
+            self.charset, self.content_type_extra,
+        )
+
+    def upload_interrupted(self):
+        if hasattr(self, 'temp_path'):
+            self.discard()
+
+    def check_signature(self):
+        self.extension = sniff_image_type(self.header)
+        if self.extension is None:
+            self.discard()
+            raise UploadRejected()
+
+    def discard(self):
+        self.file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that keeps uploads from StreamingImageUploadHandler
+    at their content-addressed name instead of copying them again.
+    """
+    def _save(self, name, content):
+        stored_name = getattr(content, 'stored_name', None)
+        if stored_name is None:
+            return super()._save(name, content)
+        if not self.exists(stored_name):
+            path = self.path(stored_name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(content.temporary_file_path(), path)
+            if self.file_permissions_mode is not None:
+                os.chmod(path, self.file_permissions_mode)
+        return stored_name
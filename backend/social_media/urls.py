@@ -6,12 +6,15 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework.authtoken.views import obtain_auth_token
+from social_media.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/token/', obtain_auth_token, name='api_token_auth'),
     path('api/users/', include('social_media.users.urls')),
     path('api/posts/', include('social_media.posts.urls')),
+    path('api/async/posts/', include('social_media.posts.async_urls')),
+    path('metrics/', metrics_view, name='metrics'),
 ]
 
 # Serve media files in development
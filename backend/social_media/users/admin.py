@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
-from .models import Profile
+from .models import Profile, Follow
 
 class ProfileInline(admin.StackedInline):
     model = Profile
@@ -13,4 +13,11 @@ class UserAdmin(BaseUserAdmin):
 
 # Re-register UserAdmin
 admin.site.unregister(User)
-admin.site.register(User, UserAdmin) 
\ No newline at end of file
+admin.site.register(User, UserAdmin) 
+
+@admin.register(Follow)
+class FollowAdmin(admin.ModelAdmin):
+    list_display = ('follower', 'followee', 'created_at')
+    list_filter = ('created_at',)
+    search_fields = ('follower__username', 'followee__username')
+    readonly_fields = ('created_at',)
\ No newline at end of file
@@ -0,0 +1,166 @@
+"""
+Token authentication with a per-process cache of token -> user lookups.
+
+TokenAuthentication joins Token and User on every request. CachedTokenAuthentication
+keeps recent results in a bounded LRU with a TTL. The receivers in
+users/models.py drop entries when a token is deleted or its user is saved,
+for example on deactivation. They only reach the current process, so other
+processes notice within AUTH_TOKEN_CACHE_TTL seconds.
+
+Authenticated requests also record the user's last activity in memory.
+Buffered timestamps are written to Profile.last_seen in a single UPDATE at
+most once every LAST_SEEN_FLUSH_INTERVAL seconds.
+"""
+import atexit
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+
+class TokenCache:
+    """
+    Thread-safe LRU of token key -> (user, token) with a TTL.
+    """
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            credentials, expires_at = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return credentials
+
+    def set(self, key, credentials):
+        with self.lock:
+            self.entries[key] = (credentials, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate_key(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def invalidate_user(self, user_id):
+        with self.lock:
+            stale = [key for key, ((user, _), _) in self.entries.items() if user.pk == user_id]
+            for key in stale:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class LastSeenBuffer:
+    """
+    Collects the ids of active users and writes their last_seen in batches.
+    """
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self.user_ids = set()
+        self.flushed_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def touch(self, user_id):
+        if self.add(user_id):
+            self.flush()
+
+    async def atouch(self, user_id):
+        if self.add(user_id):
+            await sync_to_async(self.flush)()
+
+    def add(self, user_id):
+        """
+        Buffer ``user_id`` and return True if a flush is due.
+        """
+        with self.lock:
+            self.user_ids.add(user_id)
+            return time.monotonic() - self.flushed_at >= self.flush_interval
+
+    def flush(self):
+        with self.lock:
+            user_ids, self.user_ids = self.user_ids, set()
+            self.flushed_at = time.monotonic()
+        if not user_ids:
+            return
+        from .models import Profile
+        try:
+            # A queryset update, so profile signals and cache invalidation stay quiet
+            Profile.objects.filter(user_id__in=user_ids).update(last_seen=timezone.now())
+        except DatabaseError:
+            # Try again on the next flush rather than failing the request
+            with self.lock:
+                self.user_ids |= user_ids
+
+
+token_cache = TokenCache(
+    getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', 10000),
+    getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 60),
+)
+last_seen_buffer = LastSeenBuffer(getattr(settings, 'LAST_SEEN_FLUSH_INTERVAL', 60))
+atexit.register(last_seen_buffer.flush)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Drop-in replacement for TokenAuthentication backed by token_cache.
+    """
+    def authenticate_credentials(self, key):
+        credentials = token_cache.get(key)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            token_cache.set(key, credentials)
+
+        user, token = credentials
+        last_seen_buffer.touch(user.pk)
+        # Each request gets its own copy, since views may modify and save request.user
+        return copy.copy(user), token
+
+
+async def aauthenticate_token(request):
+    """
+    CachedTokenAuthentication for plain async views. Returns (user, token),
+    or None without a token header.
+    """
+    auth = get_authorization_header(request).split()
+    if not auth or auth[0].lower() != b'token':
+        return None
+    try:
+        key, = auth[1:]
+        key = key.decode()
+    except (ValueError, UnicodeError):
+        raise AuthenticationFailed('Invalid token header.')
+
+    credentials = token_cache.get(key)
+    if credentials is None:
+        try:
+            token = await Token.objects.select_related('user').aget(key=key)
+        except Token.DoesNotExist:
+            raise AuthenticationFailed('Invalid token.')
+        if not token.user.is_active:
+            raise AuthenticationFailed('User inactive or deleted.')
+        credentials = (token.user, token)
+        token_cache.set(key, credentials)
+
+    user, token = credentials
+    await last_seen_buffer.atouch(user.pk)
+    return copy.copy(user), token
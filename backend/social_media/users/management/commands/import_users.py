@@ -0,0 +1,94 @@
+import csv
+import itertools
+import secrets
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX, identify_hasher, make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from social_media.users.models import Profile
+
+USER_COLUMNS = ('username', 'email', 'first_name', 'last_name')
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk import users and their profiles from a CSV file with a header row. '
+        'Columns: username (required), email, first_name, last_name, bio, password. '
+        'Rows are written with bulk_create, so no per-row signals fire. '
+        'Usernames that already exist are skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help='Path to the CSV file')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--hash-passwords', action='store_true',
+            help='Hash plain-text passwords. Slow by design; by default the password column '
+                 'must hold Django password hashes and empty passwords become unusable.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['csv_file'], newline='', encoding='utf-8') as csv_file:
+                reader = csv.DictReader(csv_file)
+                if 'username' not in (reader.fieldnames or []):
+                    raise CommandError('The CSV file needs a username column')
+
+                created = skipped = 0
+                while True:
+                    rows = list(itertools.islice(reader, options['batch_size']))
+                    if not rows:
+                        break
+                    batch_created = self.import_batch(rows, options['hash_passwords'])
+                    created += batch_created
+                    skipped += len(rows) - batch_created
+                    self.stdout.write(f'Imported {created} users')
+        except OSError as exc:
+            raise CommandError(exc)
+
+        self.stdout.write(self.style.SUCCESS(f'Created {created} users, skipped {skipped}'))
+
+    def import_batch(self, rows, hash_passwords):
+        rows_by_username = {}
+        for row in rows:
+            username = (row.get('username') or '').strip()
+            if username:
+                rows_by_username.setdefault(username, row)
+
+        existing = set(
+            User.objects.filter(username__in=rows_by_username).values_list('username', flat=True)
+        )
+        users = [
+            self.build_user(username, row, hash_passwords)
+            for username, row in rows_by_username.items()
+            if username not in existing
+        ]
+
+        with transaction.atomic():
+            # Primary keys come back from bulk_create on SQLite and PostgreSQL
+            users = User.objects.bulk_create(users)
+            Profile.objects.bulk_create([
+                Profile(user=user, bio=rows_by_username[user.username].get('bio') or '')
+                for user in users
+            ])
+        return len(users)
+
+    def build_user(self, username, row, hash_passwords):
+        user = User(username=username, **{
+            column: (row.get(column) or '').strip() for column in USER_COLUMNS[1:]
+        })
+        password = row.get('password') or ''
+        if not password:
+            # Same format as set_unusable_password(), minus 40 random.choice() calls per row
+            user.password = UNUSABLE_PASSWORD_PREFIX + secrets.token_hex(20)
+        elif hash_passwords:
+            user.password = make_password(password)
+        else:
+            try:
+                identify_hasher(password)
+            except ValueError:
+                raise CommandError(f'Password for {username} is not a Django password hash; use --hash-passwords')
+            user.password = password
+        return user
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.8 on 2026-10-16 22:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_profile_picture_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='last_seen',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
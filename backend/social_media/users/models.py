@@ -1,22 +1,102 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+from rest_framework.authtoken.models import Token
+
+# User fields that other apps embed, such as the post author in PostSerializer
+AUTHOR_FIELDS = ('username', 'first_name', 'last_name')
+
+# Sent with user= when a save may have changed one of AUTHOR_FIELDS; the
+# posts app drops its cached payloads on it
+author_changed = Signal()
+
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     bio = models.TextField(max_length=500, blank=True)
     profile_picture = models.ImageField(upload_to='profile_pics', blank=True, null=True)
+    # Resized, EXIF-free copies written by the image pipeline (social_media.images)
+    profile_picture_variants = models.JSONField(default=dict, blank=True)
     date_joined = models.DateTimeField(auto_now_add=True)
+    # Maintained with F() updates by the follow/unfollow actions
+    followers_count = models.PositiveIntegerField(default=0)
+    # Written in batches by CachedTokenAuthentication (social_media.users.authentication)
+    last_seen = models.DateTimeField(null=True, blank=True)
     
     def __str__(self):
         return f"{self.user.username}'s Profile"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so save_user_profile can skip no-op writes
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = {field.attname: getattr(self, field.attname) for field in self._meta.concrete_fields}
+    
+    def get_changed_fields(self):
+        """
+        Names of the loaded fields whose value differs from the database row.
+        None for profiles that were never saved or loaded.
+        """
+        loaded_values = getattr(self, '_loaded_values', None)
+        if loaded_values is None:
+            return None
+        return [
+            field.name for field in self._meta.concrete_fields
+            if field.attname in loaded_values and getattr(self, field.attname) != loaded_values[field.attname]
+        ]
+
+
+class Follow(models.Model):
+    follower = models.ForeignKey(User, on_delete=models.CASCADE, related_name='following')
+    followee = models.ForeignKey(User, on_delete=models.CASCADE, related_name='followers')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ('follower', 'followee')
+    
+    def __str__(self):
+        return f"{self.follower.username} follows {self.followee.username}"
+
+
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance)
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save() 
\ No newline at end of file
+def save_user_profile(sender, instance, created, raw=False, **kwargs):
+    # Only sync a profile that was loaded through this user and edited since;
+    # last_login and password saves never touch the profile row
+    if created or raw or not User.profile.is_cached(instance):
+        return
+    profile = instance.profile
+    changed_fields = profile.get_changed_fields()
+    if changed_fields is None:
+        profile.save()
+    elif changed_fields:
+        profile.save(update_fields=changed_fields)
+
+@receiver(post_save, sender=User)
+def invalidate_cached_user_tokens(sender, instance, **kwargs):
+    # Deactivation, password and name changes must not be served from the token cache
+    from .authentication import token_cache
+    token_cache.invalidate_user(instance.pk)
+
+@receiver(post_save, sender=User)
+def announce_author_change(sender, instance, created, update_fields=None, **kwargs):
+    # Saves that list their fields only count when an author field is among
+    # them, so last_login updates stay quiet; full saves may have changed anything
+    if created or (update_fields is not None and not set(update_fields) & set(AUTHOR_FIELDS)):
+        return
+    author_changed.send(sender=User, user=instance)
+
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    from .authentication import token_cache
+    token_cache.invalidate_key(instance.key)
@@ -1,7 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Profile
+from .models import Profile, Follow
 from rest_framework.authtoken.models import Token
+from social_media.images import ImageVariantsField
 
 User = get_user_model()
 
@@ -41,7 +42,15 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return user
 
 class ProfileSerializer(serializers.ModelSerializer):
+    profile_picture_srcset = ImageVariantsField(source='profile_picture_variants')
+    
     class Meta:
         model = Profile
-        fields = ('bio', 'profile_picture', 'date_joined')
-        read_only_fields = ('date_joined',) 
\ No newline at end of file
+        fields = ('bio', 'profile_picture', 'profile_picture_srcset', 'date_joined')
+        read_only_fields = ('date_joined',) 
+
+class FollowSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Follow
+        fields = ('id', 'follower', 'followee', 'created_at')
+        read_only_fields = ('id', 'follower', 'followee', 'created_at')
\ No newline at end of file
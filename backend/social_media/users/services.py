@@ -0,0 +1,64 @@
+from django.contrib.auth.models import User
+from rest_framework.authtoken.models import Token
+from social_media.images import build_variant_urls
+from .models import Profile
+
+
+def user_payload_queryset():
+    """
+    Users with their profile and auth token joined in, so building a payload
+    is a single query.
+    """
+    return User.objects.select_related('profile', 'auth_token')
+
+
+def load_user(user_id):
+    return user_payload_queryset().get(pk=user_id)
+
+
+def get_token_key(user):
+    """
+    Return the user's auth token, creating it on first use.
+    """
+    try:
+        return user.auth_token.key
+    except Token.DoesNotExist:
+        token, _ = Token.objects.get_or_create(user=user)
+        return token.key
+
+
+def build_user_payload(user):
+    """
+    The user and profile data returned by login, me, update_profile and
+    debug_token.
+    """
+    try:
+        profile = user.profile
+    except Profile.DoesNotExist:
+        profile = None
+
+    if profile is not None:
+        profile_picture_url = None
+        if profile.profile_picture and hasattr(profile.profile_picture, 'url'):
+            profile_picture_url = profile.profile_picture.url
+        profile_data = {
+            'bio': profile.bio or '',
+            'profile_picture': profile_picture_url,
+            'profile_picture_srcset': build_variant_urls(profile.profile_picture_variants),
+            'date_joined': user.date_joined.isoformat()
+        }
+    else:
+        profile_data = {
+            'bio': '',
+            'profile_picture': None,
+            'profile_picture_srcset': {},
+            'date_joined': user.date_joined.isoformat()
+        }
+
+    return {
+        'id': user.id,
+        'username': user.username,
+        'first_name': user.first_name or '',
+        'last_name': user.last_name or '',
+        'profile': profile_data
+    }
@@ -0,0 +1,198 @@
+import io
+import os
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from .authentication import LastSeenBuffer, token_cache
+from .models import Profile
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoginTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='member', password='password', first_name='Member')
+
+    def login(self):
+        return self.client.post('/api/users/login/', {'username': 'member', 'password': 'password'}, format='json')
+
+    def test_login_queries(self):
+        token = Token.objects.create(user=self.user)
+        # The user by username for authenticate(), then the user with its
+        # profile and token joined in
+        with self.assertNumQueries(2):
+            response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['token'], token.key)
+        self.assertEqual(response.data['user']['first_name'], 'Member')
+        self.assertIn('bio', response.data['user']['profile'])
+
+    def test_first_login_creates_token(self):
+        response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['token'], Token.objects.get(user=self.user).key)
+
+    def test_invalid_credentials(self):
+        response = self.client.post('/api/users/login/', {'username': 'member', 'password': 'wrong'}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_login_logs(self):
+        with self.assertLogs('social_media.users', 'DEBUG') as logs:
+            self.login()
+            self.client.post('/api/users/login/', {'username': 'member', 'password': 'wrong'}, format='json')
+        succeeded, failed = logs.records
+        self.assertEqual(succeeded.getMessage(), 'Login succeeded')
+        self.assertEqual((succeeded.username, succeeded.user_id), ('member', self.user.pk))
+        self.assertIsInstance(succeeded.auth_ms, float)
+        self.assertEqual(failed.getMessage(), 'Login failed: invalid credentials')
+        self.assertEqual(failed.username, 'member')
+        self.assertFalse(hasattr(failed, 'password'))
+
+    def test_access_log(self):
+        with self.assertLogs('social_media.requests', 'INFO') as logs:
+            response = self.client.post('/api/users/login/', {}, format='json', HTTP_X_REQUEST_ID='abc')
+        record, = logs.records
+        self.assertEqual(record.getMessage(), 'POST /api/users/login/ 400')
+        self.assertEqual((record.status, response['X-Request-ID']), (400, 'abc'))
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'login_username': '3/min'}},
+)
+class LoginThrottleTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username='member', password='password')
+
+    def login(self, username='member'):
+        return self.client.post('/api/users/login/', {'username': username, 'password': 'wrong'}, format='json')
+
+    def test_rejected_before_any_query(self):
+        for _ in range(3):
+            self.assertEqual(self.login().status_code, 401)
+        with self.assertNumQueries(0):
+            response = self.login('MEMBER')
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(response['Retry-After'].isdigit())
+        self.assertTrue(0 < int(response['Retry-After']) <= 20)
+        # Other accounts have their own bucket
+        self.assertEqual(self.login('someone').status_code, 401)
+
+
+class TokenCacheTests(APITestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user(username='member')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def tearDown(self):
+        token_cache.clear()
+
+    def me(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/users/me/')
+        return response, [query['sql'] for query in queries if 'FROM "authtoken_token"' in query['sql']]
+
+    def test_cached_after_first_request(self):
+        response, token_queries = self.me()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(token_queries), 1)
+        response, token_queries = self.me()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(token_queries, [])
+
+    def test_deleted_token(self):
+        self.assertEqual(self.me()[0].status_code, 200)
+        self.token.delete()
+        self.assertEqual(self.me()[0].status_code, 401)
+
+    def test_deactivated_user(self):
+        self.assertEqual(self.me()[0].status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.me()[0].status_code, 401)
+
+
+class LastSeenBufferTests(TestCase):
+    @mock.patch('social_media.users.authentication.time.monotonic')
+    def test_single_batched_write(self, monotonic):
+        users = [User.objects.create_user(username=f'user{index}') for index in range(3)]
+        monotonic.return_value = 1000
+        buffer = LastSeenBuffer(flush_interval=60)
+
+        monotonic.return_value = 1030
+        with self.assertNumQueries(0):
+            for user in users[:2]:
+                buffer.touch(user.pk)
+                buffer.touch(user.pk)
+        self.assertFalse(Profile.objects.filter(last_seen__isnull=False).exists())
+
+        monotonic.return_value = 1060
+        with self.assertNumQueries(1):
+            buffer.touch(users[2].pk)
+        self.assertEqual(Profile.objects.filter(last_seen__isnull=False).count(), 3)
+        # The next flush waits for another interval
+        with self.assertNumQueries(0):
+            buffer.touch(users[0].pk)
+
+
+class FollowTests(APITestCase):
+    def setUp(self):
+        self.follower = User.objects.create_user(username='follower')
+        self.followee = User.objects.create_user(username='followee')
+        self.client.force_authenticate(self.follower)
+
+    def test_follow_and_unfollow(self):
+        url = f'/api/users/{self.followee.pk}/'
+        self.assertEqual(self.client.post(url + 'follow/').status_code, 201)
+        self.assertEqual(self.client.post(url + 'follow/').status_code, 400)
+        self.assertEqual(self.client.post(url + 'unfollow/').status_code, 204)
+        self.assertEqual(self.client.post(url + 'unfollow/').status_code, 404)
+
+    def test_invalid_pk(self):
+        self.assertEqual(self.client.post('/api/users/abc/follow/').status_code, 404)
+        self.assertEqual(self.client.post('/api/users/abc/unfollow/').status_code, 404)
+
+
+class ImportUsersTests(TestCase):
+    def import_users(self, text, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as csv_file:
+            csv_file.write(text)
+        self.addCleanup(os.remove, csv_file.name)
+        stdout = io.StringIO()
+        call_command('import_users', csv_file.name, *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_import(self):
+        User.objects.create_user(username='existing')
+        output = self.import_users(
+            'username,first_name,bio,password\n'
+            'ada,Ada,Engineer,\n'
+            'existing,Someone,,\n'
+            'grace,Grace,,secret\n'
+            'ada,Duplicate,,\n',
+            '--hash-passwords', '--batch-size', '2',
+        )
+        self.assertIn('Created 2 users, skipped 2', output)
+        ada = User.objects.select_related('profile').get(username='ada')
+        self.assertEqual((ada.first_name, ada.profile.bio), ('Ada', 'Engineer'))
+        self.assertFalse(ada.has_usable_password())
+        self.assertTrue(User.objects.get(username='grace').check_password('secret'))
+        self.assertEqual(User.objects.get(username='existing').first_name, '')
+
+    def test_plain_text_password_needs_hashing(self):
+        with self.assertRaisesMessage(CommandError, 'use --hash-passwords'):
+            self.import_users('username,password\nada,secret\n')
+        self.assertFalse(User.objects.filter(username='ada').exists())
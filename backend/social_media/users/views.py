@@ -1,22 +1,39 @@
+import logging
+import time
+
 from rest_framework import viewsets, permissions, status
+from rest_framework.generics import get_object_or_404
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.contrib.auth.models import User
-from .models import Profile
-from .serializers import UserSerializer, ProfileSerializer, UserRegistrationSerializer
+from django.db import transaction
+from django.db.models import F
+from .models import Profile, Follow
+from .serializers import UserSerializer, ProfileSerializer, UserRegistrationSerializer, FollowSerializer
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.contrib.auth import authenticate
-from rest_framework.authtoken.models import Token
+from social_media.images import schedule_variants
+from social_media.throttling import LOGIN_THROTTLES
+from .services import user_payload_queryset, load_user, get_token_key, build_user_payload
+
+logger = logging.getLogger(__name__)
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    throttle_scope = 'login'
     
     def get_permissions(self):
         if self.action in ['create', 'register', 'login', 'debug_token']:
             return [AllowAny()]
         return [IsAuthenticated()]
     
+    def get_throttles(self):
+        # Checked before the password is hashed; see social_media/throttling.py
+        if self.action == 'login':
+            return [throttle() for throttle in LOGIN_THROTTLES]
+        return super().get_throttles()
+    
     def get_queryset(self):
         # Regular users can only view their own profile
         if self.request.user.is_staff:
@@ -48,54 +65,25 @@ class UserViewSet(viewsets.ModelViewSet):
         """
         Return detailed information about the current user, including profile.
         """
-        user = request.user
-        
-        # Get user's profile
-        try:
-            profile = Profile.objects.get(user=user)
-            profile_picture_url = None
-            if profile.profile_picture and hasattr(profile.profile_picture, 'url'):
-                profile_picture_url = profile.profile_picture.url
-                
-            profile_data = {
-                'bio': profile.bio or '',
-                'profile_picture': profile_picture_url,
-                'date_joined': profile.user.date_joined.isoformat()
-            }
-        except Profile.DoesNotExist:
-            profile_data = {
-                'bio': '',
-                'profile_picture': None,
-                'date_joined': user.date_joined.isoformat()
-            }
-        
-        # Create a custom response with user and profile data
-        user_data = {
-            'id': user.id,
-            'username': user.username,
-            'first_name': user.first_name,
-            'last_name': user.last_name,
-            'profile': profile_data
-        }
-        
-        return Response(user_data)
+        user = load_user(request.user.pk)
+        return Response(build_user_payload(user))
     
     @action(detail=False, methods=['put'])
     def update_profile(self, request):
         user = request.user
         user_data = {}
-        profile_data = {}
         
         # Handle basic user fields
         for field in ['first_name', 'last_name']:
             if field in request.data:
                 user_data[field] = request.data[field]
         
-        # Update user if we have user data
-        if user_data:
-            for key, value in user_data.items():
-                setattr(user, key, value)
-            user.save()
+        # Only write, and invalidate cached posts, for names that changed
+        changed_fields = [key for key, value in user_data.items() if getattr(user, key) != value]
+        if changed_fields:
+            for key in changed_fields:
+                setattr(user, key, user_data[key])
+            user.save(update_fields=changed_fields)
         
         # Handle profile picture
         profile_picture = request.FILES.get('profile_picture')
@@ -103,42 +91,19 @@ class UserViewSet(viewsets.ModelViewSet):
             # Get or create profile
             profile, created = Profile.objects.get_or_create(user=user)
             profile.profile_picture = profile_picture
+            profile.profile_picture_variants = {}
             profile.save()
+            # Resized variants are generated in the background after the response
+            schedule_variants(profile, 'profile_picture', 'profile_picture_variants')
         elif 'profile_picture' in request.data and request.data['profile_picture'] == '':
             # Remove profile picture if empty string was sent
             profile, created = Profile.objects.get_or_create(user=user)
             profile.profile_picture = None
+            profile.profile_picture_variants = {}
             profile.save()
         
         # Get updated user profile data for response
-        try:
-            profile = Profile.objects.get(user=user)
-            profile_picture_url = None
-            if profile.profile_picture and hasattr(profile.profile_picture, 'url'):
-                profile_picture_url = profile.profile_picture.url
-                
-            profile_data = {
-                'bio': profile.bio or '',
-                'profile_picture': profile_picture_url,
-                'date_joined': profile.user.date_joined.isoformat()
-            }
-        except Profile.DoesNotExist:
-            profile_data = {
-                'bio': '',
-                'profile_picture': None,
-                'date_joined': user.date_joined.isoformat()
-            }
-        
-        # Create full response
-        response_data = {
-            'id': user.id,
-            'username': user.username,
-            'first_name': user.first_name,
-            'last_name': user.last_name,
-            'profile': profile_data
-        }
-        
-        return Response(response_data)
+        return Response(build_user_payload(load_user(user.pk)))
     
     @action(detail=False, methods=['post'], permission_classes=[AllowAny])
     def login(self, request):
@@ -146,97 +111,63 @@ class UserViewSet(viewsets.ModelViewSet):
         Endpoint for user login.
         Returns a token and user data upon successful authentication.
         """
-        print(request.data, 'login request data')
         username = request.data.get('username')
         password = request.data.get('password')
         
-        print(f"Login attempt for user: {username}")
-        print(f"Request data: {request.data}")
-        
         if not username or not password:
-            print(f"Login failed: Missing username or password")
+            logger.debug('Login rejected: missing username or password', extra={'username': username})
             return Response(
                 {'detail': 'Username and password are required'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Check if this is the superuser we just created
-        superuser = User.objects.filter(username=username, is_superuser=True).first()
-        if superuser:
-            print(f"Found superuser {username}, attempting password verification")
-            # Check password directly
-            if superuser.check_password(password):
-                print(f"Superuser password verified, manual login")
-                token, _ = Token.objects.get_or_create(user=superuser)
-                
-                # Get profile for superuser
-                try:
-                    profile = Profile.objects.get(user=superuser)
-                except Profile.DoesNotExist:
-                    # Create profile for superuser if it doesn't exist
-                    profile = Profile.objects.create(user=superuser)
-                
-                profile_data = {
-                    'bio': getattr(profile, 'bio', '') or '',
-                    'profile_picture': None,
-                    'date_joined': superuser.date_joined.isoformat()
-                }
-                
-                return Response({
-                    'token': token.key,
-                    'user': {
-                        'id': superuser.id,
-                        'username': superuser.username,
-                        'first_name': superuser.first_name or '',
-                        'last_name': superuser.last_name or '',
-                        'profile': profile_data
-                    }
-                })
-        
-        # Normal authentication flow
-        print(f"Attempting authentication for user: {username}")
+        # Authenticate against the configured backends
+        started = time.perf_counter()
         user = authenticate(username=username, password=password)
+        auth_ms = round((time.perf_counter() - started) * 1000, 2)
         
         if not user:
-            print(f"Login failed: Invalid credentials for user {username}")
+            logger.debug('Login failed: invalid credentials', extra={'username': username, 'auth_ms': auth_ms})
             return Response(
                 {'detail': 'Invalid credentials'}, 
                 status=status.HTTP_401_UNAUTHORIZED
             )
         
-        print(f"Login successful for user: {username}")
-        token, _ = Token.objects.get_or_create(user=user)
-        
-        # Get user's profile
-        try:
-            profile = Profile.objects.get(user=user)
-            profile_picture_url = None
-            if profile.profile_picture and hasattr(profile.profile_picture, 'url'):
-                profile_picture_url = profile.profile_picture.url
-                
-            profile_data = {
-                'bio': profile.bio or '',
-                'profile_picture': profile_picture_url,
-                'date_joined': profile.user.date_joined.isoformat()
-            }
-        except Profile.DoesNotExist:
-            profile_data = {
-                'bio': '',
-                'profile_picture': None,
-                'date_joined': user.date_joined.isoformat()
-            }
-        
+        logger.debug('Login succeeded', extra={'username': username, 'user_id': user.pk, 'auth_ms': auth_ms})
+        # Profile and token come back joined to the user in one query
+        user = load_user(user.pk)
         return Response({
-            'token': token.key,
-            'user': {
-                'id': user.id,
-                'username': user.username,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'profile': profile_data
-            }
+            'token': get_token_key(user),
+            'user': build_user_payload(user)
         })
     
+    @action(detail=True, methods=['post'])
+    def follow(self, request, pk=None):
+        # Any user can be followed, not just the ones get_queryset exposes
+        followee = get_object_or_404(User, pk=pk)
+        if followee == request.user:
+            return Response({'detail': 'You cannot follow yourself'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        with transaction.atomic():
+            follow, created = Follow.objects.get_or_create(follower=request.user, followee=followee)
+            if created:
+                Profile.objects.filter(user=followee).update(followers_count=F('followers_count') + 1)
+        
+        if not created:
+            return Response({'detail': 'You already follow this user'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = FollowSerializer(follow)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['post'])
+    def unfollow(self, request, pk=None):
+        follow = get_object_or_404(Follow, follower=request.user, followee_id=pk)
+        with transaction.atomic():
+            follow.delete()
+            Profile.objects.filter(user_id=pk, followers_count__gt=0).update(
+                followers_count=F('followers_count') - 1
+            )
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
     def debug_token(self, request):
         """
@@ -244,34 +175,13 @@ class UserViewSet(viewsets.ModelViewSet):
         This is for debugging purposes only and should be removed in production.
         """
         # Find a superuser
-        superuser = User.objects.filter(is_superuser=True).first()
+        superuser = user_payload_queryset().filter(is_superuser=True).first()
         
         if not superuser:
             return Response({"detail": "No superuser found"}, status=status.HTTP_404_NOT_FOUND)
         
-        # Create or get a token for this user
-        token, _ = Token.objects.get_or_create(user=superuser)
-        
-        # Get or create a profile
-        try:
-            profile = Profile.objects.get(user=superuser)
-        except Profile.DoesNotExist:
-            profile = Profile.objects.create(user=superuser)
-        
-        profile_data = {
-            'bio': getattr(profile, 'bio', '') or '',
-            'profile_picture': None,
-            'date_joined': superuser.date_joined.isoformat()
-        }
-        
         # Return the token and user data
         return Response({
-            'token': token.key,
-            'user': {
-                'id': superuser.id,
-                'username': superuser.username,
-                'first_name': superuser.first_name or '',
-                'last_name': superuser.last_name or '',
-                'profile': profile_data
-            }
-        }) 
\ No newline at end of file
+            'token': get_token_key(superuser),
+            'user': build_user_payload(superuser)
+        })
\ No newline at end of file
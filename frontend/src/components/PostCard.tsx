@@ -193,7 +193,7 @@ const PostCard = ({ post, onDelete }: PostCardProps) => {
             <CommentIcon />
           </IconButton>
           <Typography variant="body2" color="text.secondary">
-            {post.comments.length}
+            {post.comments_count}
           </Typography>
         </CardActions>
       </Card>
@@ -22,6 +22,7 @@ export interface Post {
   created_at: string;
   updated_at: string;
   comments: Comment[];
+  comments_count: number;
   likes_count: number;
   is_liked: boolean;
 }